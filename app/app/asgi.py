@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Each uvicorn worker process loads the app itself.
+from core.metrics import worker_started  # noqa: E402
+
+worker_started()
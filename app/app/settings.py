@@ -35,15 +35,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'user',
     'recipe',
+    'benchmarks',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,9 +89,72 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Seconds a connection is kept for later requests; 0 reconnects
+        # on every request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Check reused connections before each request, see
+        # core.connections.
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),
+        # Behind PgBouncer in transaction pooling mode (see
+        # docker-compose.yml) the queries of a request may run on
+        # different server connections, which breaks the server-side
+        # cursors of queryset.iterator() (recipe export); results are
+        # then buffered client-side instead.
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            int(os.environ.get('DB_TRANSACTION_POOLING', 0))),
     }
 }
 
+# Read replicas
+# Safe list and retrieve requests of the recipe APIs read from the hosts
+# in DB_REPLICA_HOSTS (comma separated), see core.routers. Without any,
+# replica1 points at the primary and is only used by the tests, where it
+# mirrors the test database.
+REPLICA_HOSTS = [
+    host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host
+]
+for index, host in enumerate(
+        REPLICA_HOSTS or [DATABASES['default']['HOST']], 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [
+    f'replica{index}' for index in range(1, len(REPLICA_HOSTS) + 1)]
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Seconds a user's reads stay on the primary after a write; keep it above
+# the replication lag. Pins are kept in the default cache, which must be
+# shared between workers for them to follow the user (see core.checks).
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django_redis.cache.RedisCache, redis://redis:6379/1) to
+# share entries between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+    }
+}
+
+# Token authentication cache (user.authentication). Revoked tokens are
+# rejected at once by the process that revoked them and by the others
+# within TOKEN_CACHE_TTL seconds.
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 30))
+TOKEN_CACHE_SHARED = bool(int(os.environ.get('TOKEN_CACHE_SHARED', 0)))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -128,7 +195,16 @@ STATIC_URL = 'static/static/'
 MEDIA_URL = 'static/media/'
 
 STATIC_ROOT = 'vol/web/static'
-MEDIA_ROOT = 'vol/web/media'
+# Uploads go to the volume the proxy serves /static/media from when
+# deployed (see docker-compose-deploy.yml).
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', 'vol/web/media')
+
+# Hash static file names in collectstatic so the proxy can cache them as
+# immutable. Templates then need the manifest collectstatic writes, so
+# this is off unless STATIC_MANIFEST is set (see docker-compose-deploy).
+if int(os.environ.get('STATIC_MANIFEST', 0)):
+    STATICFILES_STORAGE = (
+        'django.contrib.staticfiles.storage.ManifestStaticFilesStorage')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -141,10 +217,78 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Text search configuration used for the recipe search vector.
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'english')
+
+# Cursor pagination for the recipe APIs. Clients may ask for up to
+# MAX_PAGE_SIZE items with the ?page_size= query parameter.
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+
+# Number of recipes fetched per server-side cursor round trip when
+# streaming a recipe export.
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Delta sync: recipes returned per changes/ call, how far checkpoints
+# trail the clock to cover writes still being committed, and how long
+# tombstones of deleted recipes are kept.
+SYNC_MAX_CHANGES = int(os.environ.get('SYNC_MAX_CHANGES', 1000))
+SYNC_CHECKPOINT_LAG = int(os.environ.get('SYNC_CHECKPOINT_LAG', 30))
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 30))
+
+# Serve recipe, tag and ingredient reads with async views (see
+# recipe.routers). Set by app/asgi.py, as they only pay off under ASGI.
+ASYNC_VIEWS = bool(int(os.environ.get('ASYNC_VIEWS', 0)))
+
+# Bulk recipe import: rows accepted per request and rows per INSERT.
+BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS', 5000))
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 500))
+
 STATICFILES_DIRS = os.path.join(BASE_DIR, 'static'),
 
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles_build', 'static')
+# collectstatic writes here; deployments point it at the volume the proxy
+# serves /static/static from.
+STATIC_ROOT = os.environ.get(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles_build', 'static'))
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Uploads are always streamed to a temporary file instead of memory.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_TEMP_DIR = os.environ.get('FILE_UPLOAD_TEMP_DIR')
+
+# Recipe images are re-encoded by the process_images worker. WEBP needs
+# Pillow built with libwebp and falls back to JPEG otherwise.
+IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT', 'JPEG')
+IMAGE_MAX_SIZE = int(os.environ.get('IMAGE_MAX_SIZE', 1600))
+IMAGE_THUMBNAIL_SIZE = int(os.environ.get('IMAGE_THUMBNAIL_SIZE', 320))
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', 85))
+
+# Fraction of requests timed by RequestTimingMiddleware, which adds a
+# Server-Timing header and a log line. Sampled requests slower than
+# REQUEST_TIMING_SLOW_MS also log their slowest SQL.
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 0))
+REQUEST_TIMING_SLOW_MS = float(os.environ.get('REQUEST_TIMING_SLOW_MS', 500))
+
+# When set, GET /metrics requires "Authorization: Bearer <METRICS_TOKEN>".
+# Unset, /metrics is only served with DEBUG on.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.environ.get('LOG_LEVEL', 'INFO'),
+        },
+    },
+}
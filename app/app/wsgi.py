@@ -15,4 +15,14 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
 
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    # Not running under uWSGI.
+    pass
+else:
+    from core.metrics import worker_started
+
+    postfork(worker_started)
+
 app = application
@@ -0,0 +1,104 @@
+"""
+Drivers sending benchmark requests in-process or to a running server.
+"""
+import json
+import uuid
+from urllib.error import HTTPError
+from urllib.parse import (urlencode, urljoin)
+from urllib.request import (Request, urlopen)
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+class InProcessDriver:
+    """Call the URL routes through the Django test client."""
+
+    counts_queries = True
+
+    def __init__(self):
+        self.client = APIClient()
+        self.queries = 0
+
+    def authenticate(self, token):
+        """Send token with every following request."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def request(self, method, path, data=None, files=None):
+        """Send a request and return its status code and decoded body."""
+        if method == 'GET':
+            kwargs = {'data': data}
+        elif files:
+            kwargs = {'data': {**(data or {}), **files},
+                      'format': 'multipart'}
+        else:
+            kwargs = {'data': data, 'format': 'json'}
+        with CaptureQueriesContext(connection) as ctx:
+            res = getattr(self.client, method.lower())(path, **kwargs)
+        self.queries += len(ctx.captured_queries)
+        if res.get('Content-Type', '').startswith('application/json'):
+            return res.status_code, res.json()
+        return res.status_code, None
+
+
+class HTTPDriver:
+    """Call the URL routes of a server listening at base_url."""
+
+    counts_queries = False
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.headers = {}
+        self.queries = 0
+
+    def authenticate(self, token):
+        """Send token with every following request."""
+        self.headers['Authorization'] = f'Token {token}'
+
+    @staticmethod
+    def _multipart(data, files):
+        """Return the content type and body of a multipart form."""
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in data.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; '
+                f'name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        for name, upload in files.items():
+            upload.seek(0)
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; '
+                f'name="{name}"; filename="{upload.name}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+                + upload.read() + b'\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return f'multipart/form-data; boundary={boundary}', b''.join(parts)
+
+    def request(self, method, path, data=None, files=None):
+        """Send a request and return its status code and decoded body."""
+        headers = dict(self.headers)
+        body = None
+        if method == 'GET':
+            path = f'{path}?{urlencode(data)}' if data else path
+        elif files:
+            headers['Content-Type'], body = self._multipart(data or {}, files)
+        elif data is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(data).encode()
+        req = Request(urljoin(self.base_url, path), data=body,
+                      headers=headers, method=method)
+        try:
+            with urlopen(req) as res:
+                status, content_type = res.status, res.headers.get(
+                    'Content-Type', '')
+                content = res.read()
+        except HTTPError as error:
+            status, content_type = error.code, error.headers.get(
+                'Content-Type', '')
+            content = error.read()
+        if content_type.startswith('application/json'):
+            return status, json.loads(content)
+        return status, None
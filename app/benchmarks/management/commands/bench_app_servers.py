@@ -0,0 +1,219 @@
+"""
+Django command comparing uWSGI and uvicorn workers under slow clients.
+
+Each server is started on a local port with the same number of worker
+processes. Slow clients keep creating recipes, trickling the request
+body at a capped rate, while fast clients time recipe list reads. A sync
+uWSGI worker is tied up for as long as a slow body takes to arrive; the
+uvicorn event loop reads bodies without holding up other requests.
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import (Request, urlopen)
+
+from django.core.management.base import (BaseCommand, CommandError)
+from django.db import connection
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from benchmarks.seed import seed_user
+from benchmarks.utils import summarize
+from core.models import RecipeTombstone
+
+EMAIL = 'bench-servers@example.com'
+
+
+def server_command(name, port, workers):
+    """Return the command line starting server name on port."""
+    if name == 'uwsgi':
+        return [
+            shutil.which('uwsgi') or 'uwsgi', '--http-socket', f':{port}',
+            '--workers', str(workers), '--master', '--module', 'app.wsgi',
+            '--die-on-term', '--disable-logging',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+        '--port', str(port), '--workers', str(workers), '--no-access-log',
+    ]
+
+
+def slow_body(size):
+    """Return a recipe creation payload of about size bytes."""
+    payload = {'title': 'Slow client recipe', 'time_minutes': 5,
+               'price': '1.00', 'description': ''}
+    padding = max(0, size - len(json.dumps(payload)))
+    payload['description'] = ('slow ' * (padding // 5 + 1))[:padding]
+    return json.dumps(payload).encode()
+
+
+class SlowClient(threading.Thread):
+    """POST body to path over and over, sending rate bytes a second."""
+
+    def __init__(self, port, path, token, body, rate, stop):
+        super().__init__(daemon=True)
+        self.port = port
+        self.headers = (
+            f'POST {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+            f'Authorization: Token {token}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+        ).encode()
+        self.body = body
+        self.chunk = max(1, rate // 10)
+        self.stop = stop
+        self.created = 0
+        self.failed = 0
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                with socket.create_connection(
+                        ('127.0.0.1', self.port), timeout=60) as sock:
+                    sock.sendall(self.headers)
+                    for offset in range(0, len(self.body), self.chunk):
+                        if self.stop.is_set():
+                            return
+                        sock.sendall(
+                            self.body[offset:offset + self.chunk])
+                        time.sleep(0.1)
+                    response = b''
+                    while True:
+                        data = sock.recv(65536)
+                        if not data:
+                            break
+                        response += data
+                if response.startswith(b'HTTP/1.1 201'):
+                    self.created += 1
+                else:
+                    self.failed += 1
+            except OSError:
+                self.failed += 1
+                time.sleep(0.1)
+
+
+class Command(BaseCommand):
+    """Benchmark app servers under concurrent slow-client load."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servers', nargs='+', choices=['uwsgi', 'uvicorn'],
+            default=['uwsgi', 'uvicorn'])
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8321)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--slow-clients', type=int, default=16)
+        parser.add_argument(
+            '--body-size', type=int, default=32768,
+            help='Bytes of recipe JSON posted by each slow client.',
+        )
+        parser.add_argument(
+            '--send-rate', type=int, default=8192,
+            help='Bytes per second sent by each slow client.',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        # The servers are separate processes, so the data is committed.
+        user = seed_user(EMAIL, recipes=options['recipes'])
+        token = Token.objects.create(user=user).key
+        try:
+            for name in options['servers']:
+                self._bench(name, token, options)
+        finally:
+            user_id = user.id
+            user.delete()
+            RecipeTombstone.objects.filter(user_id=user_id).delete()
+
+    def _bench(self, name, token, options):
+        """Start server name, load it and print its latencies."""
+        port = options['port']
+        env = {
+            **os.environ,
+            'DB_NAME': connection.settings_dict['NAME'],
+            'ALLOWED_HOST': '127.0.0.1',
+            'ASYNC_VIEWS': str(int(name == 'uvicorn')),
+            'PYTHONUNBUFFERED': '1',
+        }
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        server = subprocess.Popen(
+            server_command(name, port, options['workers']), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        stop = threading.Event()
+        try:
+            base = f'http://127.0.0.1:{port}{reverse("recipe:recipe-list")}'
+            self._wait_until_up(server, base, name)
+            slow_clients = [
+                SlowClient(
+                    port, reverse('recipe:recipe-list'), token,
+                    slow_body(options['body_size']), options['send_rate'],
+                    stop,
+                )
+                for _ in range(options['slow_clients'])
+            ]
+            for client in slow_clients:
+                client.start()
+            time.sleep(1)
+
+            def timed_read(_):
+                start = time.perf_counter()
+                try:
+                    with urlopen(Request(
+                            f'{base}?page_size=10',
+                            headers={'Authorization': f'Token {token}'},
+                    ), timeout=60) as res:
+                        res.read()
+                    ok = res.status == 200
+                except (OSError, URLError):
+                    ok = False
+                return ok, (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                results = list(
+                    pool.map(timed_read, range(options['requests'])))
+            elapsed = time.perf_counter() - start
+        finally:
+            stop.set()
+            server.terminate()
+            server.wait(30)
+
+        stats = summarize([duration for _, duration in results])
+        errors = sum(not ok for ok, _ in results)
+        self.stdout.write(
+            f'{name}: {len(results) / elapsed:.0f} req/s, '
+            f'p50 {stats["p50"]:.2f} ms, p95 {stats["p95"]:.2f} ms, '
+            f'p99 {stats["p99"]:.2f} ms, {errors} errors; slow clients '
+            f'{sum(c.created for c in slow_clients)} created, '
+            f'{sum(c.failed for c in slow_clients)} failed'
+        )
+
+    @staticmethod
+    def _wait_until_up(server, url, name, timeout=30):
+        """Wait until the server answers url or raise CommandError."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'{name} exited with {server.returncode}.')
+            try:
+                urlopen(url, timeout=1).close()
+                return
+            except URLError as error:
+                if getattr(error, 'code', None):
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'{name} did not start within {timeout}s.')
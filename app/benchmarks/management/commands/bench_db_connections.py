@@ -0,0 +1,73 @@
+"""
+Django command measuring the connection setup CONN_MAX_AGE saves.
+
+Each timing is one request's worth of database work: a fresh connection
+per request as with CONN_MAX_AGE=0, a persistent connection with the
+CONN_HEALTH_CHECKS round trip, and a persistent connection alone. Point
+--host and --port at PgBouncer to compare pooled connections.
+"""
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from benchmarks.utils import (summarize, time_calls)
+
+
+class Command(BaseCommand):
+    """Benchmark reconnecting against reusing database connections."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--host', help='Defaults to DB_HOST.')
+        parser.add_argument('--port', help='Defaults to DB_PORT.')
+        parser.add_argument(
+            '--query', default='SELECT 1',
+            help='SQL run once per simulated request.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        default = connections['default']
+        settings_dict = dict(default.settings_dict)
+        for option in ('host', 'port'):
+            if options[option]:
+                settings_dict[option.upper()] = options[option]
+        conn = type(default)(settings_dict, default.alias)
+        query = options['query']
+
+        def run_query():
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                cursor.fetchall()
+
+        def reconnect():
+            conn.connect()
+            run_query()
+            conn.close()
+
+        def health_checked():
+            if not conn.is_usable():
+                conn.close()
+            run_query()
+
+        results = {}
+        try:
+            results['new connection'] = summarize(
+                time_calls(reconnect, options['repeat']))
+            conn.connect()
+            results['persistent, health checked'] = summarize(
+                time_calls(health_checked, options['repeat']))
+            results['persistent'] = summarize(
+                time_calls(run_query, options['repeat']))
+        finally:
+            conn.close()
+
+        for name, stats in results.items():
+            self.stdout.write(
+                f'{name}: p50 {stats["p50"]:.2f} ms, '
+                f'p95 {stats["p95"]:.2f} ms, p99 {stats["p99"]:.2f} ms'
+            )
+        saved = (results['new connection']['p50']
+                 - results['persistent, health checked']['p50'])
+        self.stdout.write(f'Setup saved per request: {saved:.2f} ms (p50)')
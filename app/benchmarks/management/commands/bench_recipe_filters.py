@@ -0,0 +1,61 @@
+"""
+Django command comparing the recipe tag filter implementations.
+"""
+import operator
+from functools import reduce
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from benchmarks.seed import seed_user
+from benchmarks.utils import (rollback, summarize, time_calls)
+from core.models import (Recipe, Tag)
+
+
+def legacy_filter(queryset, field, ids):
+    """The OR-of-Q filter RecipeViewSet used before the semi-join."""
+    queries = [Q(**{f'{field}__id': id}) for id in ids]
+    return queryset.filter(reduce(operator.or_, queries)).distinct()
+
+
+class Command(BaseCommand):
+    """Benchmark OR-of-Q + DISTINCT against the semi-join tag filter."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--filter-tags', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Print the query plan of each implementation.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with rollback():
+            user = seed_user(
+                'bench-filters@example.com',
+                recipes=options['recipes'],
+                tags=options['tags'],
+            )
+            tag_ids = list(Tag.objects.filter(user=user).values_list(
+                'id', flat=True)[:options['filter_tags']])
+            base = Recipe.objects.for_user(user).order_by('-id')
+            querysets = {
+                'legacy OR + DISTINCT': legacy_filter(base, 'tags', tag_ids),
+                'semi-join (any)': base.linked_to('tags', tag_ids),
+                'group by (all)': base.linked_to('tags', tag_ids, True),
+            }
+            for name, queryset in querysets.items():
+                timings = time_calls(
+                    lambda: list(queryset.all()), options['repeat'])
+                stats = summarize(timings)
+                self.stdout.write(
+                    f'{name}: {queryset.count()} rows, '
+                    f'p50 {stats["p50"]:.2f} ms, p95 {stats["p95"]:.2f} ms'
+                )
+                if options['explain']:
+                    self.stdout.write(queryset.explain())
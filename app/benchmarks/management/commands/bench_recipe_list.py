@@ -0,0 +1,69 @@
+"""
+Django command comparing the serializer and values() recipe list paths.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.seed import seed_user
+from benchmarks.utils import (rollback, summarize, time_calls)
+from core.models import Recipe
+from recipe.renderers import FastJSONRenderer
+from recipe.serializers import (
+    RECIPE_ROW_COLUMNS,
+    RecipeSerializer,
+    serialize_recipe_rows,
+)
+
+
+def render_serializer(queryset, request):
+    """Render a page through RecipeSerializer and JSONRenderer."""
+    data = RecipeSerializer(
+        queryset.with_related(), many=True, context={'request': request},
+    ).data
+    return JSONRenderer().render(data)
+
+
+def render_rows(queryset, request):
+    """Render a page from .values() rows with FastJSONRenderer."""
+    rows = list(queryset.values(*RECIPE_ROW_COLUMNS))
+    return FastJSONRenderer().render(serialize_recipe_rows(rows, request))
+
+
+class Command(BaseCommand):
+    """Benchmark rendering recipe list pages of growing size."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        request = RequestFactory().get('/api/recipe/recipes/')
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=hosts), rollback():
+            user = seed_user(
+                'bench-list@example.com', recipes=max(options['rows']))
+            Recipe.objects.filter(user=user).update(
+                thumbnail='uploads/recipe/thumbnails/sample.jpg')
+            for rows in options['rows']:
+                page = Recipe.objects.for_user(user).order_by('-id')[:rows]
+                results = {}
+                for name, render in (('serializer', render_serializer),
+                                     ('values', render_rows)):
+                    timings = time_calls(
+                        lambda: render(page, request), options['repeat'])
+                    results[name] = summarize(timings)
+                    self.stdout.write(
+                        f'{rows} rows, {name}: '
+                        f'p50 {results[name]["p50"]:.2f} ms, '
+                        f'p95 {results[name]["p95"]:.2f} ms'
+                    )
+                speedup = results['serializer']['p50'] / max(
+                    results['values']['p50'], 1e-6)
+                self.stdout.write(f'{rows} rows, speedup: {speedup:.1f}x')
@@ -0,0 +1,61 @@
+"""
+Django command comparing full-text recipe search with icontains scans.
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from benchmarks.seed import seed_user
+from benchmarks.utils import (rollback, summarize, time_calls)
+from core.models import Recipe
+
+
+def icontains_search(queryset, text):
+    """Substring search over recipe text and tag and ingredient names."""
+    return queryset.filter(
+        Q(title__icontains=text)
+        | Q(description__icontains=text)
+        | Q(tags__name__icontains=text)
+        | Q(ingredients__name__icontains=text)
+    ).distinct()
+
+
+class Command(BaseCommand):
+    """Benchmark the GIN indexed search vector against icontains."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--search', default='curry')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Print the query plan of each implementation.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with rollback():
+            user = seed_user(
+                'bench-search@example.com', recipes=options['recipes'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_recipe')
+            base = Recipe.objects.for_user(user)
+            text = options['search']
+            querysets = {
+                'icontains': icontains_search(base, text).order_by('-id'),
+                'search vector': base.search(text).order_by('-rank', '-id'),
+            }
+            for name, queryset in querysets.items():
+                page = queryset[:options['page_size']]
+                timings = time_calls(
+                    lambda: list(page.all()), options['repeat'])
+                stats = summarize(timings)
+                self.stdout.write(
+                    f'{name}: {queryset.count()} rows, '
+                    f'p50 {stats["p50"]:.2f} ms, p95 {stats["p95"]:.2f} ms'
+                )
+                if options['explain']:
+                    self.stdout.write(page.explain())
@@ -0,0 +1,51 @@
+"""
+Django command measuring GET /api/user/me/ with and without token caching.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from benchmarks.utils import (rollback, summarize, time_calls)
+from user.authentication import (CachedTokenAuthentication, token_lru)
+from user.views import ManageUserView
+
+
+class Command(BaseCommand):
+    """Benchmark TokenAuthentication against CachedTokenAuthentication."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with rollback():
+            user = get_user_model().objects.create_user(
+                'bench-auth@example.com', 'benchpass123')
+            token = Token.objects.create(user=user)
+            request = RequestFactory().get(
+                '/api/user/me/', HTTP_AUTHORIZATION=f'Token {token.key}')
+            for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+                token_lru.clear()
+                view = ManageUserView.as_view(
+                    authentication_classes=[auth_class])
+
+                def call():
+                    view(request).render()
+
+                call()
+                with CaptureQueriesContext(connection) as ctx:
+                    timings = time_calls(call, options['requests'])
+                stats = summarize(timings)
+                self.stdout.write(
+                    f'{auth_class.__name__}: '
+                    f'{len(timings) / (sum(timings) / 1000):.0f} req/s, '
+                    f'{len(ctx.captured_queries) / len(timings):.1f} '
+                    f'queries/request, p50 {stats["p50"]:.3f} ms, '
+                    f'p99 {stats["p99"]:.3f} ms'
+                )
@@ -0,0 +1,144 @@
+"""
+Django command load testing the recipe API URL routes.
+"""
+import json
+import subprocess
+import tempfile
+
+from django.conf import settings
+
+from django.core.management.base import (BaseCommand, CommandError)
+from django.test.utils import override_settings
+
+from benchmarks.drivers import (HTTPDriver, InProcessDriver)
+from benchmarks.scenarios import build_scenarios
+from benchmarks.seed import (PASSWORD, seed_users)
+from benchmarks.utils import (rollback, summarize, time_calls)
+from user.authentication import token_lru
+
+
+def _commit():
+    """Return the checked out git commit, if there is one."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """Report latency, throughput and SQL queries per API endpoint."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Only run the named scenario, may be repeated.',
+        )
+        parser.add_argument('--users', type=int, default=3)
+        parser.add_argument('--median-recipes', type=int, default=200)
+        parser.add_argument(
+            '--base-url',
+            help='Benchmark a running server seeded with '
+                 'seed_benchmark_data instead of running in-process.',
+        )
+        parser.add_argument('--email', default='bench-user-0@example.com')
+        parser.add_argument('--output', help='Write JSON results here.')
+        parser.add_argument(
+            '--compare', help='Print deltas against an earlier --output.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['base_url']:
+            driver = HTTPDriver(options['base_url'])
+            endpoints = self._run(driver, options)
+        else:
+            driver = InProcessDriver()
+            hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(ALLOWED_HOSTS=hosts,
+                                      MEDIA_ROOT=media_root), rollback():
+                seed_users(
+                    options['users'],
+                    median_recipes=options['median_recipes'],
+                )
+                endpoints = self._run(driver, options)
+            token_lru.clear()
+
+        report = {
+            'commit': _commit(),
+            'mode': 'http' if options['base_url'] else 'in-process',
+            'options': {
+                key: options[key]
+                for key in ('requests', 'warmup', 'users', 'median_recipes')
+            },
+            'endpoints': endpoints,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                self._compare(json.load(baseline), report)
+
+    def _run(self, driver, options):
+        """Run each scenario and return its results by name."""
+        try:
+            scenarios = build_scenarios(driver, options['email'], PASSWORD)
+        except ValueError as error:
+            raise CommandError(error)
+        if options['scenarios']:
+            scenarios = [
+                scenario for scenario in scenarios
+                if scenario.name in options['scenarios']
+            ]
+
+        endpoints = {}
+        for scenario in scenarios:
+            for _ in range(options['warmup']):
+                scenario()
+            driver.queries = 0
+            outcomes = []
+            timings = time_calls(
+                lambda: outcomes.append(scenario()), options['requests'])
+            result = {
+                'requests': len(timings),
+                'errors': outcomes.count(False),
+                'rps': len(timings) / (sum(timings) / 1000),
+                **summarize(timings),
+                'queries': (
+                    driver.queries / len(timings)
+                    if driver.counts_queries else None
+                ),
+            }
+            endpoints[scenario.name] = result
+            queries = (
+                f'{result["queries"]:.1f}'
+                if result['queries'] is not None else '-'
+            )
+            self.stdout.write(
+                f'{scenario.name}: {result["rps"]:.0f} req/s, '
+                f'p50 {result["p50"]:.2f} ms, p95 {result["p95"]:.2f} ms, '
+                f'p99 {result["p99"]:.2f} ms, {queries} queries/request, '
+                f'{result["errors"]} errors'
+            )
+        return endpoints
+
+    def _compare(self, baseline, report):
+        """Print the change of each endpoint against baseline."""
+        self.stdout.write(f'Compared to {baseline["commit"] or "baseline"}:')
+        for name, result in report['endpoints'].items():
+            before = baseline['endpoints'].get(name)
+            if before is None:
+                continue
+            deltas = ', '.join(
+                f'{key} {(result[key] / before[key] - 1) * 100:+.1f}%'
+                for key in ('rps', 'p50', 'p95', 'p99')
+                if before[key]
+            )
+            self.stdout.write(f'{name}: {deltas}')
@@ -0,0 +1,42 @@
+"""
+Django command seeding persistent data for run_benchmarks --base-url.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import seed_users
+
+
+class Command(BaseCommand):
+    """Seed benchmark users with recipes, tags and ingredients."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--median-recipes', type=int, default=200)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument('--email-prefix', default='bench-user')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete previously seeded benchmark users first.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        prefix = options['email_prefix']
+        if options['clear']:
+            deleted, _ = get_user_model().objects.filter(
+                email__startswith=f'{prefix}-').delete()
+            self.stdout.write(f'Deleted {deleted} rows.')
+        users = seed_users(
+            options['users'],
+            median_recipes=options['median_recipes'],
+            email_prefix=prefix,
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+        )
+        for user in users:
+            self.stdout.write(
+                f'{user.email}: {user.recipe_set.count()} recipes')
@@ -0,0 +1,90 @@
+"""
+Request scenarios exercised by the run_benchmarks command.
+"""
+import itertools
+from io import BytesIO
+
+from django.urls import reverse
+from PIL import Image
+
+
+class Scenario:
+    """A named request expected to answer with expected_status."""
+
+    def __init__(self, name, expected_status, send):
+        self.name = name
+        self.expected_status = expected_status
+        self.send = send
+
+    def __call__(self):
+        """Send the request and return whether it succeeded."""
+        status, _ = self.send()
+        return status == self.expected_status
+
+
+def _results(driver, path, **params):
+    """Return the first page of results of a list endpoint."""
+    status, body = driver.request('GET', path, params)
+    if status != 200:
+        raise ValueError(f'GET {path} returned {status}.')
+    return body['results']
+
+
+def _image():
+    """Return a small in-memory JPEG upload."""
+    upload = BytesIO()
+    Image.new('RGB', (640, 480), 'orange').save(upload, format='JPEG')
+    upload.name = 'bench.jpg'
+    return upload
+
+
+def build_scenarios(driver, email, password):
+    """Authenticate driver as the user and return the scenarios."""
+    credentials = {'email': email, 'password': password}
+    status, body = driver.request('POST', reverse('user:token'), credentials)
+    if status != 200:
+        raise ValueError(f'Could not get a token for {email}.')
+    driver.authenticate(body['token'])
+
+    recipes_url = reverse('recipe:recipe-list')
+    tags = _results(driver, reverse('recipe:tag-list'))[:2]
+    ingredients = _results(driver, reverse('recipe:ingredient-list'))[:2]
+    recipes = _results(driver, recipes_url)
+    if not recipes:
+        raise ValueError(f'{email} has no recipes to benchmark.')
+    recipe_ids = itertools.cycle([recipe['id'] for recipe in recipes])
+    upload_id = next(recipe_ids)
+    image = _image()
+
+    def upload():
+        image.seek(0)
+        url = reverse('recipe:recipe-upload-image', args=[upload_id])
+        return driver.request('POST', url, files={'image': image})
+
+    payload = {
+        'title': 'Benchmark recipe',
+        'time_minutes': 30,
+        'price': '5.50',
+        'tags': [{'name': tag['name']} for tag in tags],
+        'ingredients': [{'name': item['name']} for item in ingredients],
+    }
+    tag_ids = ','.join(str(tag['id']) for tag in tags)
+    ingredient_ids = ','.join(str(item['id']) for item in ingredients)
+    return [
+        Scenario('token', 200, lambda: driver.request(
+            'POST', reverse('user:token'), credentials)),
+        Scenario('user-me', 200, lambda: driver.request(
+            'GET', reverse('user:me'))),
+        Scenario('recipe-list', 200, lambda: driver.request(
+            'GET', recipes_url)),
+        Scenario('recipe-list-tags', 200, lambda: driver.request(
+            'GET', recipes_url, {'tags': tag_ids})),
+        Scenario('recipe-list-ingredients', 200, lambda: driver.request(
+            'GET', recipes_url, {'ingredients': ingredient_ids})),
+        Scenario('recipe-detail', 200, lambda: driver.request(
+            'GET', reverse('recipe:recipe-detail',
+                           args=[next(recipe_ids)]))),
+        Scenario('recipe-create', 201, lambda: driver.request(
+            'POST', recipes_url, payload)),
+        Scenario('image-upload', 202, upload),
+    ]
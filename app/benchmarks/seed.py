@@ -0,0 +1,101 @@
+"""
+Seed benchmark data in bulk.
+
+Tag and ingredient popularity follows a Zipf-like curve and the number
+per recipe varies around a mean, as in real collections where a few
+staples appear everywhere. Recipes per user are log-normal, giving a
+long tail of power users.
+"""
+import math
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from core.models import (Recipe, Tag, Ingredient)
+
+PASSWORD = 'benchpass123'
+STYLES = ['Spicy', 'Creamy', 'Smoky', 'Crispy', 'Zesty', 'Roasted',
+          'Braised', 'Grilled', 'Sweet', 'Herby']
+DISHES = ['curry', 'soup', 'salad', 'stew', 'pasta', 'tacos', 'risotto',
+          'noodles', 'pie', 'burger', 'omelette', 'casserole']
+
+
+def _bulk_ids(model, objs, user):
+    """Bulk insert objs and return the ids of all of user's rows."""
+    model.objects.bulk_create(objs, batch_size=1000)
+    return list(
+        model.objects.filter(user=user).values_list('id', flat=True))
+
+
+def _pick(rng, ids, weights, mean):
+    """Return a set of about mean ids drawn by popularity weight."""
+    count = min(len(ids), max(0, round(rng.gauss(mean, mean / 2))))
+    if count * 2 > len(ids):
+        return set(rng.sample(ids, count))
+    picked = set()
+    while len(picked) < count:
+        picked.update(rng.choices(ids, weights, k=count - len(picked)))
+    return picked
+
+
+def _link(field, recipe_ids, target_ids, per_recipe, rng):
+    """Link each recipe to about per_recipe popular targets via field."""
+    descriptor = getattr(Recipe, field)
+    through = descriptor.through
+    target = f'{descriptor.field.m2m_reverse_field_name()}_id'
+    weights = [1 / rank for rank in range(1, len(target_ids) + 1)]
+    through.objects.bulk_create([
+        through(**{'recipe_id': recipe_id, target: target_id})
+        for recipe_id in recipe_ids
+        for target_id in _pick(rng, target_ids, weights, per_recipe)
+    ], batch_size=5000)
+
+
+def seed_user(email, recipes=1000, tags=50, ingredients=200,
+              tags_per_recipe=3, ingredients_per_recipe=8, seed=0):
+    """Create a user with a recipe collection and return it."""
+    rng = random.Random(seed)
+    user = get_user_model().objects.create_user(email, PASSWORD)
+    tag_ids = _bulk_ids(Tag, [
+        Tag(user=user, name=f'Tag {i}') for i in range(tags)
+    ], user)
+    ingredient_ids = _bulk_ids(Ingredient, [
+        Ingredient(user=user, name=f'Ingredient {i}')
+        for i in range(ingredients)
+    ], user)
+    recipe_ids = _bulk_ids(Recipe, [
+        Recipe(
+            user=user,
+            title=f'{rng.choice(STYLES)} {rng.choice(DISHES)} {i}',
+            description='Mix, season and cook until done. ' * 20,
+            time_minutes=rng.randint(5, 180),
+            price=Decimal(rng.randint(100, 5000)) / 100,
+        )
+        for i in range(recipes)
+    ], user)
+    _link('tags', recipe_ids, tag_ids, tags_per_recipe, rng)
+    _link('ingredients', recipe_ids, ingredient_ids,
+          ingredients_per_recipe, rng)
+    Recipe.objects.filter(user=user).update_search_vector()
+    return user
+
+
+def seed_users(users, median_recipes=200, email_prefix='bench-user',
+               seed=0, **kwargs):
+    """Create users with log-normally sized collections and return them.
+
+    The first user always gets the largest collection so benchmarks can
+    target a known power user.
+    """
+    rng = random.Random(seed)
+    sizes = sorted(
+        (round(rng.lognormvariate(math.log(median_recipes), 1))
+         for _ in range(users)),
+        reverse=True,
+    )
+    return [
+        seed_user(f'{email_prefix}-{index}@example.com', recipes=size,
+                  seed=seed + index, **kwargs)
+        for index, size in enumerate(sizes)
+    ]
@@ -0,0 +1,138 @@
+"""
+Tests for the benchmark commands.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import (TestCase, TransactionTestCase)
+
+from core.models import (Recipe, RecipeTombstone)
+
+
+class BenchmarkCommandTests(TestCase):
+    """Smoke test benchmark commands on tiny data sets."""
+
+    def test_bench_recipe_filters(self):
+        """Test filter benchmark reports every implementation."""
+        out = StringIO()
+
+        call_command(
+            'bench_recipe_filters', recipes=20, tags=5, repeat=2,
+            explain=True, stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('legacy OR + DISTINCT', output)
+        self.assertIn('semi-join (any)', output)
+        self.assertIn('group by (all)', output)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bench_recipe_search(self):
+        """Test search benchmark reports both implementations."""
+        out = StringIO()
+
+        call_command(
+            'bench_recipe_search', recipes=20, repeat=2, explain=True,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('icontains: ', output)
+        self.assertIn('search vector: ', output)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bench_recipe_list(self):
+        """Test list benchmark reports both paths for each page size."""
+        out = StringIO()
+
+        call_command(
+            'bench_recipe_list', rows=[5, 10], repeat=2, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('5 rows, serializer: ', output)
+        self.assertIn('10 rows, values: ', output)
+        self.assertIn('10 rows, speedup: ', output)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bench_db_connections(self):
+        """Test connection benchmark reports each connection mode."""
+        out = StringIO()
+
+        call_command('bench_db_connections', repeat=3, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('new connection: ', output)
+        self.assertIn('persistent, health checked: ', output)
+        self.assertIn('Setup saved per request: ', output)
+
+    def test_bench_token_auth(self):
+        """Test token benchmark reports both authentication classes."""
+        out = StringIO()
+
+        call_command('bench_token_auth', requests=5, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('TokenAuthentication: ', output)
+        self.assertIn('CachedTokenAuthentication: ', output)
+
+    def test_run_benchmarks(self):
+        """Test load test reports every scenario and writes JSON."""
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+
+            call_command(
+                'run_benchmarks', requests=2, warmup=1, users=2,
+                median_recipes=5, output=output, compare=output,
+                stdout=out,
+            )
+
+            with open(output) as result:
+                report = json.load(result)
+        self.assertEqual(report['mode'], 'in-process')
+        for name in ('token', 'user-me', 'recipe-list', 'recipe-list-tags',
+                     'recipe-list-ingredients', 'recipe-detail',
+                     'recipe-create', 'image-upload'):
+            self.assertEqual(report['endpoints'][name]['errors'], 0)
+            self.assertIsNotNone(report['endpoints'][name]['queries'])
+            self.assertIn(f'{name}: ', out.getvalue())
+        self.assertIn('Compared to', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_seed_benchmark_data(self):
+        """Test seeding creates users with recipes and can clear them."""
+        out = StringIO()
+
+        call_command('seed_benchmark_data', users=2, median_recipes=3,
+                     tags=5, ingredients=10, stdout=out)
+        call_command('seed_benchmark_data', users=1, median_recipes=3,
+                     tags=5, ingredients=10, clear=True, stdout=out)
+
+        self.assertEqual(get_user_model().objects.filter(
+            email__startswith='bench-user-').count(), 1)
+        self.assertIn('bench-user-0@example.com: ', out.getvalue())
+
+
+class AppServerBenchmarkTests(TransactionTestCase):
+    """Smoke test the app server benchmark against real servers."""
+
+    def test_bench_app_servers(self):
+        """Test both servers are started, loaded and cleaned up after."""
+        out = StringIO()
+
+        call_command(
+            'bench_app_servers', workers=1, recipes=5, slow_clients=1,
+            body_size=1024, requests=4, concurrency=2, stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('uwsgi: ', output)
+        self.assertIn('uvicorn: ', output)
+        self.assertNotIn(' 0 created', output)
+        self.assertIn(', 0 errors;', output)
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(RecipeTombstone.objects.exists())
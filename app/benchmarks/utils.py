@@ -0,0 +1,41 @@
+"""
+Helpers shared by the benchmark commands.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def rollback():
+    """Run the block in a transaction that is always rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of values."""
+    ordered = sorted(values)
+    index = round(pct / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def time_calls(func, repeat):
+    """Call func repeat times and return each duration in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    """Return latency percentiles for a list of millisecond timings."""
+    return {
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+    }
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+
+        from core import checks, signals  # noqa: F401
+        from core.connections import close_unhealthy_connections
+        from core.metrics import install_query_counter
+        from core.middleware import install_query_timer
+
+        connection_created.connect(install_query_counter)
+        connection_created.connect(install_query_timer)
+        request_started.connect(close_unhealthy_connections)
@@ -0,0 +1,34 @@
+"""
+Database access from async views.
+
+Django runs sync code called from async views on one shared thread per
+process unless told otherwise, which serializes every query of every
+request. database_sync_to_async runs it on the event loop's thread pool
+instead, so requests query in parallel, each thread on its own
+connection.
+"""
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from core.connections import close_unhealthy_connections
+
+
+def _with_connection(func):
+    """Wrap func to recycle the thread's connection around each call."""
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        close_unhealthy_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+def database_sync_to_async(func):
+    """Return an awaitable version of func, run on a pool thread.
+
+    Connections follow CONN_MAX_AGE and CONN_HEALTH_CHECKS as they do
+    for sync requests, with each pool thread keeping its own.
+    """
+    return sync_to_async(_with_connection(func), thread_sensitive=False)
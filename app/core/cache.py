@@ -0,0 +1,76 @@
+"""
+Per-user cache for tag and ingredient lookups.
+
+Entries are stored under a version number kept per user and model.
+Writes bump the version (see core.signals), which orphans everything
+cached under the previous one; the orphans then expire on their own.
+"""
+import hashlib
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.metrics import CACHE_REQUESTS
+
+# Process-local hit/miss counters.
+stats = Counter()
+
+
+def _version_key(model, user_id):
+    """Return the cache key holding the version for user's model rows."""
+    return f'{model._meta.label_lower}:{user_id}:version'
+
+
+def get_version(model, user_id):
+    """Return the current cache version for user's model rows."""
+    key = _version_key(model, user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a lost version key can never bring
+        # back entries stored under an older version.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _incr_version(key):
+    """Increment the version stored at key, if there is one."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version yet, so nothing has been cached to invalidate.
+        pass
+
+
+def bump_version(model, user_id):
+    """Invalidate everything cached for user's model rows.
+
+    Inside a transaction the version is bumped again on commit, so rows
+    cached by other requests before the commit are invalidated as well.
+    """
+    key = _version_key(model, user_id)
+    _incr_version(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _incr_version(key))
+
+
+def _key(model, user_id, name):
+    """Return the versioned cache key for name."""
+    digest = hashlib.md5(name.encode()).hexdigest()
+    version = get_version(model, user_id)
+    return f'{model._meta.label_lower}:{user_id}:{version}:{digest}'
+
+
+def get(model, user_id, name):
+    """Return the cached value for name, or None on a miss."""
+    value = cache.get(_key(model, user_id, name))
+    stats['misses' if value is None else 'hits'] += 1
+    CACHE_REQUESTS.labels('attr', 'miss' if value is None else 'hit').inc()
+    return value
+
+
+def set(model, user_id, name, value):
+    """Cache value for name under the current version."""
+    cache.set(_key(model, user_id, name), value)
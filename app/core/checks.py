@@ -0,0 +1,30 @@
+"""
+System checks for the core app.
+"""
+from django.conf import settings
+from django.core.checks import (Error, register)
+
+# Cache backends whose entries are not seen by other worker processes.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_replica_pin_cache(app_configs, **kwargs):
+    """Require a shared cache to pin users to the primary after writes.
+
+    Pins (see core.routers) live in the default cache; in a per-process
+    one only the worker that took the write would honour them.
+    """
+    if not (settings.DATABASE_REPLICAS and settings.REPLICA_STICKY_SECONDS):
+        return []
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        'Read replicas need a cache shared between workers.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared backend '
+             'such as memcached, or unset DB_REPLICA_HOSTS.',
+        id='core.E001',
+    )]
@@ -0,0 +1,24 @@
+"""
+Upkeep of persistent database connections.
+
+With CONN_MAX_AGE set, a connection outlives its request and the server
+may have dropped it (restart, failover, PgBouncer recycling) before the
+next request reuses it. Django 3.2 has no CONN_HEALTH_CHECKS, which
+Django 4.1 added for this, so databases setting it are checked here.
+"""
+from django.db import connections
+
+
+def close_unhealthy_connections(**kwargs):
+    """Close reused connections failing a health check (request_started).
+
+    Runs after Django's close_old_connections and costs one round trip
+    per open connection of a database with CONN_HEALTH_CHECKS set. A
+    closed connection is reopened by the request's first query.
+    """
+    for conn in connections.all():
+        if (conn.connection is not None
+                and conn.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not conn.in_atomic_block
+                and not conn.is_usable()):
+            conn.close()
@@ -0,0 +1,163 @@
+"""
+Background processing of uploaded recipe images.
+
+Uploads are saved as-is and marked pending; the process_images command
+claims pending recipes one at a time, so several workers can share the
+queue.
+"""
+import io
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import (connection, transaction)
+from PIL import (Image, ImageOps, features)
+
+from core.models import (Recipe, ImageStatus)
+
+logger = logging.getLogger(__name__)
+
+# First key of the advisory locks claiming recipe images.
+IMAGE_LOCK_CLASS = 1010
+
+
+def _image_format():
+    """Return the configured output format and its file extension."""
+    image_format = settings.IMAGE_FORMAT.upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        image_format = 'JPEG'
+    return image_format, '.webp' if image_format == 'WEBP' else '.jpg'
+
+
+def _encode(image, max_size):
+    """Return image shrunk to fit max_size, re-encoded without metadata."""
+    image = image.copy()
+    image.thumbnail((max_size, max_size))
+    image_format, ext = _image_format()
+    buffer = io.BytesIO()
+    # No exif= argument is passed, so EXIF data is not written out.
+    image.save(buffer, format=image_format, quality=settings.IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue(), name=f'image{ext}')
+
+
+@contextmanager
+def _claim(recipe_id):
+    """Yield whether this worker holds the recipe's image until exit.
+
+    The claim is a session advisory lock rather than a row lock, so no
+    transaction stays open, and the recipe can still be written to, while
+    the image is processed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s, %s)',
+                       [IMAGE_LOCK_CLASS, recipe_id])
+        claimed = cursor.fetchone()[0]
+    try:
+        yield claimed
+    finally:
+        if claimed:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)',
+                               [IMAGE_LOCK_CLASS, recipe_id])
+
+
+def _delete_on_commit(storage, names):
+    """Delete the named files once the transaction commits."""
+    names = [name for name in names if name]
+
+    def delete():
+        for name in names:
+            storage.delete(name)
+
+    if names:
+        transaction.on_commit(delete)
+
+
+def process_recipe_image(recipe):
+    """Resize, re-encode and thumbnail the recipe's uploaded image.
+
+    The new files are written to storage and set on recipe, which is not
+    saved; on failure any written so far are deleted again.
+    """
+    with recipe.image.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    storage = recipe.image.storage
+    written = []
+    try:
+        image_file = _encode(image, settings.IMAGE_MAX_SIZE)
+        recipe.image.save(image_file.name, image_file, save=False)
+        written.append(recipe.image.name)
+        thumbnail_file = _encode(image, settings.IMAGE_THUMBNAIL_SIZE)
+        recipe.thumbnail.save(
+            thumbnail_file.name, thumbnail_file, save=False)
+    except Exception:
+        for name in written:
+            storage.delete(name)
+        raise
+
+
+def _process(recipe_id):
+    """Process the claimed recipe's image; return False if it was gone."""
+    recipe = Recipe.objects.filter(
+        pk=recipe_id, image_status=ImageStatus.PENDING).first()
+    if recipe is None:
+        return False
+    original = recipe.image.name
+    old_thumbnail = recipe.thumbnail.name
+    try:
+        process_recipe_image(recipe)
+        failed = False
+    except Exception:
+        # Any error, such as Image.DecompressionBombError, fails only
+        # this image rather than stopping the worker.
+        logger.exception('Processing image of recipe %s failed', recipe_id)
+        failed = True
+
+    storage = recipe.image.storage
+    new_files = [] if failed else [recipe.image.name, recipe.thumbnail.name]
+    with transaction.atomic():
+        # Only the short final write holds the row lock. A new upload
+        # while the image was processed replaces this result.
+        current = Recipe.objects.select_for_update().filter(
+            pk=recipe_id, image_status=ImageStatus.PENDING, image=original,
+        ).first()
+        if current is None:
+            _delete_on_commit(storage, new_files)
+            return False
+        if failed:
+            current.image_status = ImageStatus.FAILED
+            current.save(update_fields=['image_status', 'updated_at'])
+            return True
+        current.image = recipe.image.name
+        current.thumbnail = recipe.thumbnail.name
+        current.image_status = ImageStatus.READY
+        # updated_at moves so delta syncs report the finished image.
+        current.save(update_fields=[
+            'image', 'thumbnail', 'image_status', 'updated_at'])
+        # Files are only removed once nothing can roll back to them.
+        _delete_on_commit(storage, [original, old_thumbnail])
+    return True
+
+
+def process_pending(limit=10):
+    """Process up to limit pending images and return how many were done."""
+    processed = 0
+    tried = set()
+    while processed < limit:
+        recipe_ids = list(Recipe.objects.filter(
+            image_status=ImageStatus.PENDING,
+        ).exclude(
+            id__in=tried,
+        ).order_by('id').values_list('id', flat=True)[:limit - processed])
+        if not recipe_ids:
+            break
+        for recipe_id in recipe_ids:
+            tried.add(recipe_id)
+            # Recipes claimed by another worker are skipped.
+            with _claim(recipe_id) as claimed:
+                if claimed and _process(recipe_id):
+                    processed += 1
+    return processed
@@ -0,0 +1,34 @@
+"""
+Django command to process uploaded recipe images in the background.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.images import process_pending
+
+
+class Command(BaseCommand):
+    """Django command running the recipe image worker"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process the pending images and exit.',
+        )
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when no images are pending.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        while True:
+            processed = process_pending(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Processed {processed} image(s)')
+            if options['once'] and processed < options['batch_size']:
+                break
+            if not processed:
+                time.sleep(options['poll_interval'])
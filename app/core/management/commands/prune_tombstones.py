@@ -0,0 +1,21 @@
+"""
+Django command to delete recipe tombstones older than the sync window.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RecipeTombstone
+
+
+class Command(BaseCommand):
+    """Django command pruning expired recipe tombstones"""
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+        deleted, _ = RecipeTombstone.objects.filter(
+            deleted_at__lt=cutoff).delete()
+        self.stdout.write(f'Deleted {deleted} tombstone(s)')
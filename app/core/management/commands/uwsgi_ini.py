@@ -0,0 +1,170 @@
+"""
+Django command writing a uWSGI ini file sized for this container.
+
+Processes and threads follow the CPUs and memory the container may use
+(cgroup limits first, then the host). Every value can be overridden
+with a WSGI_* environment variable; see OPTIONS.
+"""
+import math
+import os
+
+from django.core.management.base import (BaseCommand, CommandError)
+
+# Environment variables overriding each computed uWSGI option.
+OPTIONS = {
+    'WSGI_PROCESSES': 'processes',
+    'WSGI_THREADS': 'threads',
+    'WSGI_MAX_REQUESTS': 'max-requests',
+    'WSGI_RELOAD_ON_RSS': 'reload-on-rss',
+    'WSGI_HARAKIRI': 'harakiri',
+    'WSGI_LISTEN': 'listen',
+    'WSGI_BUFFER_SIZE': 'buffer-size',
+    'WSGI_STATS': 'stats',
+}
+# Estimated RSS of one worker process in MiB, used to fit processes into
+# the memory limit (WSGI_WORKER_MEMORY).
+WORKER_MEMORY = 200
+# Seconds a request may run before uWSGI kills its worker (WSGI_HARAKIRI).
+# This covers whole requests, including the streamed recipe export. The
+# proxy buffers responses, so an export only has to be generated in this
+# time, not downloaded. Raise it if exports take longer; 0 disables it.
+HARAKIRI = 300
+
+
+def _read(path):
+    """Return the stripped contents of path, or None if unreadable."""
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_count():
+    """Return the number of CPUs this process may use."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    cpu_max = _read('/sys/fs/cgroup/cpu.max')
+    if cpu_max and not cpu_max.startswith('max'):
+        limit, period = cpu_max.split()[:2]
+        quota = int(limit) / int(period)
+    else:
+        limit = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        period = _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if limit and period and int(limit) > 0:
+            quota = int(limit) / int(period)
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def memory_mb():
+    """Return the memory this process may use in MiB."""
+    limits = []
+    for path in ('/sys/fs/cgroup/memory.max',
+                 '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read(path)
+        if value and value.isdigit():
+            limits.append(int(value) // 2 ** 20)
+    meminfo = _read('/proc/meminfo') or ''
+    for line in meminfo.splitlines():
+        if line.startswith('MemTotal:'):
+            limits.append(int(line.split()[1]) // 1024)
+    return min(limits) if limits else 1024
+
+
+def somaxconn():
+    """Return the kernel's cap on listen queues."""
+    value = _read('/proc/sys/net/core/somaxconn')
+    return int(value) if value and value.isdigit() else 128
+
+
+def build_options(env, cpus, memory, max_listen):
+    """Return the uWSGI options for cpus and memory in MiB as a dict."""
+    worker_memory = int(env.get('WSGI_WORKER_MEMORY') or WORKER_MEMORY)
+    processes = max(1, min(2 * cpus, int(memory * 0.75) // worker_memory))
+    defaults = {
+        'processes': processes,
+        'threads': 2,
+        'max-requests': 5000,
+        'reload-on-rss': max(
+            worker_memory, min(2 * worker_memory,
+                               int(memory * 0.9) // processes)),
+        'harakiri': HARAKIRI,
+        'listen': min(1024, max_listen),
+        'buffer-size': 32768,
+        'stats': '/tmp/uwsgi-stats.sock',
+    }
+    for name, option in OPTIONS.items():
+        if env.get(name):
+            defaults[option] = env[name]
+    for option in ('processes', 'threads', 'max-requests', 'listen'):
+        try:
+            if int(defaults[option]) < 1:
+                raise ValueError
+        except ValueError:
+            raise CommandError(
+                f'{option} must be a positive integer, '
+                f'got {defaults[option]!r}.')
+    if int(defaults['listen']) > max_listen:
+        raise CommandError(
+            f'listen {defaults["listen"]} exceeds the kernel limit '
+            f'{max_listen} (net.core.somaxconn).')
+
+    return {
+        'socket': ':9000',
+        'module': 'app.wsgi',
+        'master': True,
+        # Load the app once in the master and fork the workers from it,
+        # sharing its memory copy-on-write.
+        'lazy-apps': False,
+        'enable-threads': True,
+        'single-interpreter': True,
+        'need-app': True,
+        'die-on-term': True,
+        'vacuum': True,
+        **defaults,
+        # Spread recycling so the workers do not all restart at once.
+        'max-requests-delta': max(1, int(defaults['max-requests']) // 20),
+        'harakiri-verbose': True,
+        'memory-report': True,
+        'thunder-lock': True,
+        'attach-daemon': 'python manage.py process_images',
+        'cron': '0 3 -1 -1 -1 python manage.py prune_tombstones',
+    }
+
+
+def render(options):
+    """Return options in ini format."""
+    lines = ['[uwsgi]']
+    for option, value in options.items():
+        if isinstance(value, bool):
+            value = str(value).lower()
+        lines.append(f'{option} = {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class Command(BaseCommand):
+    """Print a uWSGI ini file sized for the container."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', help='Write the ini file here instead of stdout.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        cpus, memory = cpu_count(), memory_mb()
+        ini = render(build_options(os.environ, cpus, memory, somaxconn()))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(ini)
+            self.stdout.write(
+                f'Wrote {options["output"]} for {cpus} CPUs and '
+                f'{memory} MiB.')
+        else:
+            self.stdout.write(ini, ending='')
@@ -0,0 +1,131 @@
+"""
+Prometheus metrics exported at /metrics.
+
+With PROMETHEUS_MULTIPROC_DIR set (see scripts/run.sh) every uWSGI
+worker writes its samples to mmap files in that directory and the
+endpoint aggregates the files of all workers. Recycled workers leave
+their counter and histogram files behind, which the totals need, but
+their live gauge files are removed (see worker_started).
+"""
+import atexit
+import glob
+import os
+import re
+import time
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    'django_http_request_duration_seconds',
+    'Request latency by route name.',
+    ['route', 'method'],
+)
+RESPONSES = Counter(
+    'django_http_responses',
+    'Responses by route name and status code.',
+    ['route', 'method', 'status'],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'django_http_requests_in_progress',
+    'Requests currently being handled.',
+    multiprocess_mode='livesum',
+)
+DB_QUERIES = Counter(
+    'django_db_queries',
+    'SQL queries executed by database alias.',
+    ['alias'],
+)
+DB_QUERY_SECONDS = Counter(
+    'django_db_query_seconds',
+    'Time spent executing SQL queries by database alias.',
+    ['alias'],
+)
+CACHE_REQUESTS = Counter(
+    'app_cache_requests',
+    'Cache lookups by cache and result (hit or miss).',
+    ['cache', 'result'],
+)
+IMAGE_UPLOAD_BYTES = Histogram(
+    'recipe_image_upload_bytes',
+    'Size of uploaded recipe images.',
+    buckets=[2 ** power for power in range(14, 25)],
+)
+
+
+def count_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing every query."""
+    alias = context['connection'].alias
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERIES.labels(alias).inc()
+        DB_QUERY_SECONDS.labels(alias).inc(time.perf_counter() - start)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """Count the queries of a new connection (connection_created)."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def render():
+    """Return the metrics of every worker in the text exposition format."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def _alive(pid):
+    """Return whether process pid is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def mark_dead_workers(path=None):
+    """Drop the live gauge samples of workers that have exited.
+
+    Catches workers killed without running their exit hooks, such as
+    those uWSGI's harakiri or reload-on-rss took down.
+    """
+    path = path or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    pids = {
+        int(match.group(1))
+        for match in (
+            re.search(r'_(\d+)\.db$', name)
+            for name in glob.glob(os.path.join(path, 'gauge_live*_*.db'))
+        )
+        if match
+    }
+    for pid in pids:
+        if not _alive(pid):
+            multiprocess.mark_process_dead(pid, path)
+
+
+def worker_started():
+    """Set up metrics bookkeeping in a new worker process.
+
+    Called after uWSGI forks a worker (app/wsgi.py) or when a uvicorn
+    worker loads the app (app/asgi.py).
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return
+    atexit.register(multiprocess.mark_process_dead, os.getpid())
+    mark_dead_workers()
@@ -0,0 +1,213 @@
+"""
+Middleware reporting request timings and metrics.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+import types
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timing', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper timing queries of sampled requests.
+
+    The timing is found through a context variable, which asgiref
+    copies into the threads async views run their queries in.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """Time the queries of a new connection (connection_created)."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def _on_loop(hook):
+    """Return an async version of a hook method that never blocks."""
+    async def async_hook(self, *args):
+        return hook(self, *args)
+    return async_hook
+
+
+class HybridMiddleware:
+    """Base of middleware running natively under both WSGI and ASGI.
+
+    Like django's MiddlewareMixin, an instance wrapping an async handler
+    marks itself as a coroutine function and is called through acall.
+    The hooks named in loop_hooks are then also run on the event loop
+    rather than on the thread Django keeps for sync code.
+    """
+
+    sync_capable = True
+    async_capable = True
+    loop_hooks = ()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            for name in self.loop_hooks:
+                hook = _on_loop(getattr(type(self), name))
+                setattr(self, name, types.MethodType(hook, self))
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        return self.call(request)
+
+
+class RequestTiming:
+    """Timings in milliseconds collected while handling one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = self.view_end = self.render_end = None
+        self.queries = []
+        self.db = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Time a query as a database execute wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.db += duration
+            self.queries.append((duration, sql))
+
+    def rendered(self, response):
+        """Note the end of rendering as a post-render callback."""
+        self.render_end = time.perf_counter()
+
+    def phases(self):
+        """Return the duration of each phase of the request."""
+        end = time.perf_counter()
+        view_end = self.view_end or end
+        view = (view_end - self.view_start) * 1000 if self.view_start else 0
+        serializer = 0
+        if self.view_end and self.render_end:
+            serializer = (self.render_end - self.view_end) * 1000
+        return {
+            'db': self.db,
+            'serializer': serializer,
+            'view': view,
+            'render': (end - view_end) * 1000 if self.view_start else 0,
+            'total': (end - self.start) * 1000,
+        }
+
+
+class RequestTimingMiddleware(HybridMiddleware):
+    """Add Server-Timing headers and log lines to sampled requests.
+
+    Serialization is timed as the rendering of the Response returned by
+    a DRF view, from the end of the view until its data is rendered.
+    """
+
+    loop_hooks = ('process_view', 'process_template_response')
+
+    def call(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._report(request, response, timing)
+
+    async def acall(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._report(request, response, timing)
+
+    def _report(self, request, response, timing):
+        """Add the Server-Timing header of response and log it."""
+        phases = timing.phases()
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration:.2f}'
+            + (f';desc="{len(timing.queries)} queries"' if name == 'db'
+               else '')
+            for name, duration in phases.items()
+        )
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': len(timing.queries),
+            **{f'{name}_ms': round(value, 2)
+               for name, value in phases.items()},
+        }))
+        if phases['total'] >= settings.REQUEST_TIMING_SLOW_MS:
+            self._log_slow(request, timing, phases['total'])
+        return response
+
+    def _log_slow(self, request, timing, total):
+        """Log the slowest queries of a request over the threshold."""
+        slowest = sorted(timing.queries, reverse=True)[:20]
+        logger.warning(
+            'Slow request %s %s took %.2f ms with %d queries:\n%s',
+            request.method, request.path, total, len(timing.queries),
+            '\n'.join(f'{duration:.2f} ms: {sql}'
+                      for duration, sql in slowest),
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current.get()
+        if timing is not None:
+            timing.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timing = _current.get()
+        if timing is not None:
+            timing.view_end = time.perf_counter()
+            response.add_post_render_callback(timing.rendered)
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Record latency and status of every request per route name."""
+
+    def call(self, request):
+        start = time.perf_counter()
+        with metrics.REQUESTS_IN_PROGRESS.track_inprogress():
+            response = self.get_response(request)
+        return self._observe(request, response, start)
+
+    async def acall(self, request):
+        start = time.perf_counter()
+        with metrics.REQUESTS_IN_PROGRESS.track_inprogress():
+            response = await self.get_response(request)
+        return self._observe(request, response, start)
+
+    def _observe(self, request, response, start):
+        """Record the latency and status of a finished request."""
+        match = request.resolver_match
+        route = match.view_name if match else '<unresolved>'
+        metrics.REQUEST_LATENCY.labels(route, request.method).observe(
+            time.perf_counter() - start)
+        metrics.RESPONSES.labels(
+            route, request.method, response.status_code).inc()
+        return response
@@ -0,0 +1,40 @@
+# Merge duplicate per-user tag and ingredient names ahead of the unique
+# constraints added in 0008.
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Fold each user's duplicate tags and ingredients into the oldest."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        target = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user_id', 'name').annotate(
+            keep=Min('id'), total=Count('id'),
+        ).filter(total__gt=1)
+        for duplicate in duplicates:
+            extra_ids = model.objects.filter(
+                user_id=duplicate['user_id'], name=duplicate['name'],
+            ).exclude(id=duplicate['keep']).values_list('id', flat=True)
+            for extra_id in list(extra_ids):
+                linked = through.objects.filter(
+                    **{target: duplicate['keep']}).values('recipe_id')
+                links = through.objects.filter(**{target: extra_id})
+                links.filter(recipe_id__in=linked).delete()
+                links.update(**{target: duplicate['keep']})
+                model.objects.filter(id=extra_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names, migrations.RunPython.noop),
+    ]
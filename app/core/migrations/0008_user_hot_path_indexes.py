@@ -0,0 +1,61 @@
+# Indexes are built CONCURRENTLY so large tables stay writable while the
+# migration runs, which is why this migration is not atomic.
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+def add_unique_concurrently(model_name, name):
+    """Add a (user, name) unique constraint without blocking writes.
+
+    The unique index is built concurrently and then attached to the table
+    as a constraint, which only takes a brief lock.
+    """
+    table = f'core_{model_name}'
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            migrations.RunSQL(
+                sql=(
+                    f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{name}" '
+                    f'ON "{table}" ("user_id", "name")'
+                ),
+                reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"',
+            ),
+            migrations.RunSQL(
+                sql=(
+                    f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" '
+                    f'UNIQUE USING INDEX "{name}"'
+                ),
+                reverse_sql=f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"',
+            ),
+        ],
+        state_operations=[
+            migrations.AddConstraint(
+                model_name=model_name,
+                constraint=models.UniqueConstraint(
+                    fields=('user', 'name'), name=name),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0007_merge_duplicate_names'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+        ),
+        add_unique_concurrently('tag', 'unique_tag_name_per_user'),
+        add_unique_concurrently(
+            'ingredient', 'unique_ingredient_name_per_user'),
+    ]
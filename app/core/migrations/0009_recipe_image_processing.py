@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:46
+
+import core.models
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_user_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail',
+            field=models.ImageField(null=True, upload_to=core.models.recipe_thumbnail_file_path),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('image_status', 'pending')), fields=['id'], name='recipe_image_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+def fill_search_vectors(apps, schema_editor):
+    """Compute the search vector of every existing recipe.
+
+    The expression is a copy of core.models.recipe_search_vector as of
+    this migration, so later changes to it do not alter this one.
+    """
+    alias = schema_editor.connection.alias
+    Recipe = apps.get_model('core', 'Recipe')
+
+    def names(model_name):
+        model = apps.get_model('core', model_name)
+        return models.Subquery(
+            model.objects.using(alias).filter(recipe=models.OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(names=StringAgg('name', ' ')).values('names')
+        )
+
+    config = settings.SEARCH_CONFIG
+    Recipe.objects.using(alias).update(
+        search_vector=(
+            SearchVector('title', config=config, weight='A')
+            + SearchVector(names('Tag'), names('Ingredient'),
+                           config=config, weight='B')
+            + SearchVector('description', config=config, weight='C')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_recipe_image_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+    ]
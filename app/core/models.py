@@ -4,7 +4,17 @@ Database Models
 import uuid
 import os
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+)
+from django.db import (connections, models, transaction)
+from django.db.models.functions import Cast
+from django.utils import timezone
 from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
@@ -20,6 +30,35 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads', 'recipe', filename)
 
 
+def recipe_thumbnail_file_path(instance, filename):
+    """Generates file path for new recipe thumbnail."""
+    ext = os.path.splitext(filename)[1]
+    filename = f'{uuid.uuid4()}{ext}'
+
+    return os.path.join('uploads', 'recipe', 'thumbnails', filename)
+
+
+def recipe_search_vector(tag_model, ingredient_model):
+    """Return the search vector expression of a recipe row.
+
+    Titles weigh most, then tag and ingredient names, then descriptions.
+    """
+    def names(model):
+        return models.Subquery(
+            model.objects.filter(recipe=models.OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(names=StringAgg('name', ' ')).values('names')
+        )
+
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('title', config=config, weight='A')
+        + SearchVector(names(tag_model), names(ingredient_model),
+                       config=config, weight='B')
+        + SearchVector('description', config=config, weight='C')
+    )
+
+
 class UserManager(BaseUserManager):
     """Manager of users."""
 
@@ -58,6 +97,125 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
+# M2M relations serialized with a recipe.
+RELATED_FIELDS = ('tags', 'ingredients')
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Queryset helpers for loading recipes efficiently."""
+
+    def for_user(self, user):
+        """Limit recipes to those owned by user."""
+        return self.filter(user=user)
+
+    def linked_to(self, field, ids, match_all=False):
+        """Filter recipes linked through M2M field to any of ids.
+
+        With match_all only recipes linked to every id are kept. Both
+        forms are a semi-join on the through table, so no DISTINCT over
+        recipe rows is needed.
+        """
+        descriptor = getattr(self.model, field)
+        target = descriptor.field.m2m_reverse_field_name()
+        links = descriptor.through.objects.filter(**{f'{target}__in': ids})
+        if match_all:
+            links = links.values('recipe_id').annotate(
+                matched=models.Count(target, distinct=True),
+            ).filter(matched=len(set(ids)))
+        return self.filter(id__in=links.values('recipe_id'))
+
+    def search(self, text):
+        """Filter recipes matching text and annotate their rank.
+
+        On PostgreSQL this matches the stored search_vector through its
+        GIN index. Other databases fall back to icontains scans and rank
+        every match equally.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            matches = models.Q(title__icontains=text) | models.Q(
+                description__icontains=text)
+            for field in ('tags', 'ingredients'):
+                through = getattr(self.model, field).through
+                target = getattr(self.model, field).field \
+                    .m2m_reverse_field_name()
+                matches |= models.Q(id__in=through.objects.filter(
+                    **{f'{target}__name__icontains': text},
+                ).values('recipe_id'))
+            return self.filter(matches).annotate(
+                rank=models.Value(1.0, output_field=models.FloatField()))
+
+        query = SearchQuery(
+            text, config=settings.SEARCH_CONFIG, search_type='websearch')
+        # Cast the real returned by ts_rank so cursor positions round
+        # trip exactly.
+        return self.filter(search_vector=query).annotate(rank=Cast(
+            SearchRank(models.F('search_vector'), query),
+            models.FloatField(),
+        ))
+
+    def update_search_vector(self, touch=False):
+        """Recompute the stored search vector of the recipes.
+
+        With touch their updated_at is set to now as well, for changes
+        made outside of Recipe.save().
+        """
+        changes = {'updated_at': timezone.now()} if touch else {}
+        if connections[self.db].vendor == 'postgresql':
+            changes['search_vector'] = recipe_search_vector(Tag, Ingredient)
+        return self.update(**changes) if changes else 0
+
+    @staticmethod
+    def _related_lookups(fields=RELATED_FIELDS, ids_only=()):
+        """Return Prefetch lookups loading only what serializers use.
+
+        Relations in ids_only load just the primary keys.
+        """
+        targets = {'tags': Tag, 'ingredients': Ingredient}
+        return tuple(
+            models.Prefetch(field, queryset=targets[field].objects.only(
+                'id', *(() if field in ids_only else ('name',))))
+            for field in fields
+        )
+
+    def with_related(self, fields=RELATED_FIELDS, ids_only=()):
+        """Prefetch nested tags and ingredients in one query each."""
+        return self.prefetch_related(
+            *self._related_lookups(fields, ids_only))
+
+    def iterator_with_related(self, chunk_size=2000, fields=RELATED_FIELDS,
+                              ids_only=()):
+        """Stream recipes from a server-side cursor with nested relations.
+
+        iterator() ignores prefetch_related, so tags and ingredients are
+        prefetched for each chunk of chunk_size recipes instead.
+        """
+        lookups = self._related_lookups(fields, ids_only)
+        chunk = []
+        for recipe in self.iterator(chunk_size=chunk_size):
+            chunk.append(recipe)
+            if len(chunk) == chunk_size:
+                models.prefetch_related_objects(chunk, *lookups)
+                yield from chunk
+                chunk = []
+        models.prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """Manager of recipes."""
+
+    def get_queryset(self):
+        """Leave the search vector in the database unless asked for."""
+        return super().get_queryset().defer('search_vector')
+
+
+class ImageStatus(models.TextChoices):
+    """Processing state of a recipe image."""
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
 class Recipe(models.Model):
     """Model for recipe."""
     user = models.ForeignKey(
@@ -72,6 +230,48 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(
+        max_length=10, choices=ImageStatus.choices, blank=True)
+    thumbnail = models.ImageField(
+        null=True, upload_to=recipe_thumbnail_file_path)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Kept up to date by core.signals; see recipe_search_vector.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='recipe_user_id_desc_idx',
+            ),
+            # Queue of images waiting for core.images to process them.
+            models.Index(
+                fields=['id'],
+                name='recipe_image_pending_idx',
+                condition=models.Q(image_status=ImageStatus.PENDING),
+            ),
+            # Range filters and ordering on time and price; id breaks
+            # ties in either direction.
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx',
+            ),
+            # Delta sync walks changes in (updated_at, id) order.
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='recipe_user_updated_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -84,6 +284,17 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also serves as the (user, name) index for per-user
+            # lookups and name ordering.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -96,6 +307,108 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also serves as the (user, name) index for per-user
+            # lookups and name ordering.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class _PendingBumps(set):
+    """User ids whose collection version is bumped on commit."""
+
+    # Tests may run hooks early, leaving them listed until the commit.
+    ran = False
+
+    def __call__(self):
+        self.ran = True
+        for user_id in sorted(self):
+            CollectionVersion.objects.bump(user_id)
+
+
+class CollectionVersionManager(models.Manager):
+    """Manager of collection versions."""
+
+    def bump_on_commit(self, user_id):
+        """Bump the user's version once the transaction commits.
+
+        Every bump of a transaction shares one on_commit hook, so a write
+        touching many rows updates each user's version once. Bumping
+        after the commit also means a reader never pairs the new version
+        with rows it cannot see yet. Outside transactions it bumps now.
+        """
+        connection = transaction.get_connection(self.db)
+        for _, callback in connection.run_on_commit:
+            if isinstance(callback, _PendingBumps) and not callback.ran:
+                callback.add(user_id)
+                return
+        transaction.on_commit(_PendingBumps([user_id]), using=self.db)
+
+    def bump(self, user_id):
+        """Record a change to the user's recipes, tags or ingredients."""
+        changes = {
+            'version': models.F('version') + 1,
+            'modified_at': timezone.now(),
+        }
+        if not self.filter(user_id=user_id).update(**changes):
+            self.bulk_create(
+                [self.model(user_id=user_id)], ignore_conflicts=True)
+            self.filter(user_id=user_id).update(**changes)
+
+    def current(self, user_id):
+        """Return the user's (version, modified_at), or (0, None)."""
+        return self.filter(user_id=user_id).values_list(
+            'version', 'modified_at').first() or (0, None)
+
+
+class CollectionVersion(models.Model):
+    """Version of everything a user owns, used to validate caches."""
+    # Bumps may run while the user is being deleted, so there is no
+    # foreign key constraint or cascade to race with.
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    version = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CollectionVersionManager()
+
+
+class RecipeTombstone(models.Model):
+    """Record of a deleted recipe for delta sync clients."""
+    # Recipes are also deleted when their user is, so like
+    # CollectionVersion this has no foreign key constraint to race with.
+    # Old tombstones are removed by the prune_tombstones command.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    recipe_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'deleted_at'],
+                name='tombstone_user_deleted_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='tombstone_deleted_idx',
+            ),
+        ]
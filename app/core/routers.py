@@ -0,0 +1,66 @@
+"""
+Database router sending safe reads to replicas.
+
+Reads go to the primary unless a view opts in with
+start_replica_reads(), as the recipe, tag and ingredient list and
+retrieve actions do (see recipe.views.ReplicaReadMixin). Writes always
+go to the primary, and a user who just wrote is pinned to it for
+REPLICA_STICKY_SECONDS so they read their own writes while the replicas
+catch up.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Replica the current request reads from, if any. Context variables
+# follow the request into the pool threads of async views.
+_replica = contextvars.ContextVar('replica', default=None)
+
+
+def _pin_key(user_id):
+    """Return the cache key pinning user_id to the primary."""
+    return f'replica:pinned:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send user_id's reads to the primary for REPLICA_STICKY_SECONDS."""
+    if settings.DATABASE_REPLICAS and settings.REPLICA_STICKY_SECONDS:
+        cache.set(_pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    """Return whether user_id wrote within REPLICA_STICKY_SECONDS."""
+    return bool(cache.get(_pin_key(user_id)))
+
+
+def start_replica_reads():
+    """Route the current context's reads to a replica.
+
+    One replica is picked for all of them, so they see the same point
+    of its replication. Returns a token to pass to end_replica_reads().
+    """
+    return _replica.set(random.choice(settings.DATABASE_REPLICAS))
+
+
+def end_replica_reads(token):
+    """Send reads back to the primary after start_replica_reads()."""
+    _replica.reset(token)
+
+
+class ReplicaRouter:
+    """Route reads after start_replica_reads() to DATABASE_REPLICAS."""
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
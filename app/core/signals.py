@@ -0,0 +1,161 @@
+"""
+Signal handlers keeping core.cache, collection versions, tombstones and
+recipe search vectors in step with writes.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import (
+    post_save,
+    pre_delete,
+    post_delete,
+    m2m_changed,
+)
+from django.dispatch import receiver
+
+from core import cache
+from core.models import (
+    CollectionVersion,
+    Recipe,
+    RecipeTombstone,
+    Tag,
+    Ingredient,
+)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_attr(sender, instance, **kwargs):
+    """Invalidate the owner's cache when a tag or ingredient changes."""
+    cache.bump_version(sender, instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_attrs(sender, instance, **kwargs):
+    """Deleting a recipe changes which tags and ingredients are assigned."""
+    cache.bump_version(Tag, instance.user_id)
+    cache.bump_version(Ingredient, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_recipe_links(sender, instance, action, reverse, model,
+                            **kwargs):
+    """Invalidate the owner's cache when recipe links change."""
+    if action.startswith('post_'):
+        attr_model = type(instance) if reverse else model
+        cache.bump_version(attr_model, instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+def bump_collection_version(sender, instance, **kwargs):
+    """Record that the owner's collection changed."""
+    CollectionVersion.objects.bump_on_commit(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def record_recipe_tombstone(sender, instance, **kwargs):
+    """Remember the deleted recipe for delta sync clients."""
+    RecipeTombstone.objects.create(
+        user_id=instance.user_id, recipe_id=instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_linked_collection_version(sender, instance, action, **kwargs):
+    """Record that the owner's recipe links changed."""
+    if action.startswith('post_'):
+        CollectionVersion.objects.bump_on_commit(instance.user_id)
+
+
+# Recipe ids whose search vector is recomputed when deferred_search_vectors()
+# exits, keyed by whether updated_at is touched as well.
+_deferred_search_vectors = ContextVar('deferred_search_vectors', default=None)
+
+
+@contextmanager
+def deferred_search_vectors():
+    """Recompute the search vectors changed in the block once, at its end.
+
+    Recipes saved in the block already have a fresh updated_at, so only
+    the others are touched.
+    """
+    pending = {False: set(), True: set()}
+    token = _deferred_search_vectors.set(pending)
+    try:
+        yield
+    finally:
+        _deferred_search_vectors.reset(token)
+    touched = pending[True] - pending[False]
+    if pending[False]:
+        Recipe.objects.filter(
+            pk__in=pending[False]).update_search_vector()
+    if touched:
+        Recipe.objects.filter(pk__in=touched).update_search_vector(touch=True)
+
+
+def update_search_vectors(ids, touch=False):
+    """Recompute search vectors of the recipe ids, or defer it."""
+    pending = _deferred_search_vectors.get()
+    if pending is not None:
+        pending[touch].update(ids)
+    elif ids:
+        Recipe.objects.filter(pk__in=ids).update_search_vector(touch=touch)
+
+
+def _linked_recipe_ids(instance):
+    """Return ids of the recipes linked to a tag or ingredient."""
+    return list(Recipe.objects.filter(
+        **{f'{instance._meta.model_name}s': instance},
+    ).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields, **kwargs):
+    """Recompute the search vector when the recipe text changes."""
+    if update_fields is None or {'title', 'description'} & update_fields:
+        update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_search_vectors(sender, instance, action, reverse,
+                                 pk_set, **kwargs):
+    """Recompute search vectors of recipes whose links changed."""
+    if reverse and action == 'pre_clear':
+        # post_clear no longer knows which recipes were linked.
+        instance._cleared_recipe_ids = _linked_recipe_ids(instance)
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        ids = [instance.pk]
+    elif pk_set is None:
+        ids = getattr(instance, '_cleared_recipe_ids', [])
+    else:
+        ids = pk_set
+    update_search_vectors(ids, touch=True)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search_vectors(sender, instance, created, **kwargs):
+    """Recompute search vectors of recipes using a saved name."""
+    if not created:
+        update_search_vectors(_linked_recipe_ids(instance), touch=True)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """Note the recipes of a tag or ingredient before links cascade."""
+    instance._linked_recipe_ids = _linked_recipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_unlinked_search_vectors(sender, instance, **kwargs):
+    """Recompute search vectors of recipes that lost a name."""
+    update_search_vectors(
+        getattr(instance, '_linked_recipe_ids', []), touch=True)
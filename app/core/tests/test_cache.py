@@ -0,0 +1,93 @@
+"""
+Tests for the per-user tag and ingredient cache.
+"""
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as django_cache
+from django.test import TestCase
+
+from core import cache
+from core.models import (Recipe, Tag, Ingredient)
+
+
+class AttrCacheTests(TestCase):
+    """Test versioned cache entries and their invalidation."""
+
+    def setUp(self):
+        django_cache.clear()
+        cache.stats.clear()
+        self.user = get_user_model().objects.create_user(
+            'cache@example.com', 'testpass123')
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+    def test_get_counts_hits_and_misses(self):
+        """Test lookups update the hit and miss counters."""
+        self.assertIsNone(cache.get(Tag, self.user.id, 'names'))
+        cache.set(Tag, self.user.id, 'names', {'Vegan': 1})
+
+        self.assertEqual(
+            cache.get(Tag, self.user.id, 'names'), {'Vegan': 1})
+        self.assertEqual(cache.stats['misses'], 1)
+        self.assertEqual(cache.stats['hits'], 1)
+
+    def test_entries_scoped_to_model_and_user(self):
+        """Test entries do not leak between users or models."""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        cache.set(Tag, self.user.id, 'names', {'Vegan': 1})
+
+        self.assertIsNone(cache.get(Tag, other.id, 'names'))
+        self.assertIsNone(cache.get(Ingredient, self.user.id, 'names'))
+
+    def test_tag_save_invalidates(self):
+        """Test saving a tag invalidates the owner's tag entries."""
+        cache.set(Tag, self.user.id, 'names', {})
+
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.assertIsNone(cache.get(Tag, self.user.id, 'names'))
+
+    def test_ingredient_delete_invalidates(self):
+        """Test deleting an ingredient invalidates ingredient entries."""
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        cache.set(Ingredient, self.user.id, 'names', {'Salt': ingredient.id})
+
+        ingredient.delete()
+
+        self.assertIsNone(cache.get(Ingredient, self.user.id, 'names'))
+
+    def test_recipe_link_invalidates(self):
+        """Test linking a tag to a recipe invalidates tag entries."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        cache.set(Tag, self.user.id, 'names', {'Vegan': tag.id})
+        cache.set(Ingredient, self.user.id, 'names', {})
+
+        self.recipe.tags.add(tag)
+
+        self.assertIsNone(cache.get(Tag, self.user.id, 'names'))
+        self.assertEqual(cache.get(Ingredient, self.user.id, 'names'), {})
+
+    def test_recipe_delete_invalidates(self):
+        """Test deleting a recipe invalidates tag and ingredient entries."""
+        cache.set(Tag, self.user.id, 'names', {})
+        cache.set(Ingredient, self.user.id, 'names', {})
+
+        self.recipe.delete()
+
+        self.assertIsNone(cache.get(Tag, self.user.id, 'names'))
+        self.assertIsNone(cache.get(Ingredient, self.user.id, 'names'))
+
+    def test_bump_repeated_on_commit(self):
+        """Test the version is bumped again when the transaction commits."""
+        version = cache.get_version(Tag, self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            cache.bump_version(Tag, self.user.id)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(cache.get_version(Tag, self.user.id), version + 2)
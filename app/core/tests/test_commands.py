@@ -1,11 +1,20 @@
 """Test custom Django management commands"""
 
+import configparser
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (SimpleTestCase, TestCase, override_settings)
+from django.utils import timezone
+
+from core.management.commands import uwsgi_ini
+from core.models import RecipeTombstone
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -30,3 +39,85 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class PruneTombstonesTests(TestCase):
+    """Test pruning recipe tombstones."""
+
+    @override_settings(SYNC_TOMBSTONE_DAYS=30)
+    def test_prune_tombstones(self):
+        """Test only tombstones older than the sync window are deleted."""
+        user = get_user_model().objects.create_user(
+            'prune@example.com', 'testpass123')
+        old = RecipeTombstone.objects.create(user=user, recipe_id=1)
+        RecipeTombstone.objects.filter(pk=old.pk).update(
+            deleted_at=timezone.now() - timedelta(days=31))
+        recent = RecipeTombstone.objects.create(user=user, recipe_id=2)
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(
+            list(RecipeTombstone.objects.all()), [recent])
+
+
+class UwsgiIniTests(SimpleTestCase):
+    """Test generating the uWSGI ini file."""
+
+    def test_sized_from_cpus_and_memory(self):
+        """Test processes follow the CPUs unless memory runs out."""
+        options = uwsgi_ini.build_options({}, 4, 8192, 4096)
+
+        self.assertEqual(options['processes'], 8)
+        self.assertEqual(options['reload-on-rss'], 400)
+        self.assertFalse(options['lazy-apps'])
+
+        options = uwsgi_ini.build_options({}, 8, 1024, 4096)
+
+        self.assertEqual(options['processes'], 3)
+        self.assertEqual(options['reload-on-rss'], 307)
+
+    def test_environment_overrides(self):
+        """Test WSGI_* variables override the computed values."""
+        env = {'WSGI_PROCESSES': '3', 'WSGI_THREADS': '',
+               'WSGI_STATS': ':9191', 'WSGI_MAX_REQUESTS': '1000'}
+
+        options = uwsgi_ini.build_options(env, 4, 8192, 4096)
+
+        self.assertEqual(options['processes'], '3')
+        self.assertEqual(options['threads'], 2)
+        self.assertEqual(options['stats'], ':9191')
+        self.assertEqual(options['max-requests-delta'], 50)
+
+    def test_harakiri_allows_exports(self):
+        """Test the export time limit is the documented one or disabled."""
+        options = uwsgi_ini.build_options({}, 4, 8192, 4096)
+
+        self.assertEqual(options['harakiri'], 300)
+
+        env = {'WSGI_HARAKIRI': '0'}
+        options = uwsgi_ini.build_options(env, 4, 8192, 4096)
+
+        self.assertEqual(options['harakiri'], '0')
+
+    def test_invalid_values_rejected(self):
+        """Test bad counts and listen queues over somaxconn fail."""
+        for env in ({'WSGI_THREADS': '0'}, {'WSGI_PROCESSES': 'many'},
+                    {'WSGI_LISTEN': '8192'}):
+            with self.assertRaises(CommandError):
+                uwsgi_ini.build_options(env, 4, 8192, 4096)
+
+    @patch('core.management.commands.uwsgi_ini.memory_mb', return_value=4096)
+    @patch('core.management.commands.uwsgi_ini.cpu_count', return_value=2)
+    def test_command_writes_ini(self, patched_cpus, patched_memory):
+        """Test the command prints an ini file uWSGI can read."""
+        out = StringIO()
+
+        with patch.dict('os.environ', {'WSGI_HARAKIRI': '30'}):
+            call_command('uwsgi_ini', stdout=out)
+
+        parser = configparser.ConfigParser()
+        parser.read_string(out.getvalue())
+        self.assertEqual(parser['uwsgi']['processes'], '4')
+        self.assertEqual(parser['uwsgi']['harakiri'], '30')
+        self.assertEqual(parser['uwsgi']['lazy-apps'], 'false')
+        self.assertEqual(parser['uwsgi']['module'], 'app.wsgi')
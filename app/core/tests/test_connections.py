@@ -0,0 +1,46 @@
+"""
+Tests for the database connection health checks.
+"""
+from unittest.mock import (MagicMock, patch)
+
+from django.core.signals import request_started
+from django.test import SimpleTestCase
+
+from core.connections import close_unhealthy_connections
+
+
+def make_connection(usable=True, health_checks=True, atomic=False):
+    """Return a mock of an open database connection."""
+    conn = MagicMock(in_atomic_block=atomic)
+    conn.settings_dict = {'CONN_HEALTH_CHECKS': health_checks}
+    conn.is_usable.return_value = usable
+    return conn
+
+
+@patch('core.connections.connections')
+class HealthCheckTests(SimpleTestCase):
+    """Test reused connections are checked before each request."""
+
+    def test_unusable_connection_closed(self, patched_connections):
+        """Test a connection the server dropped is closed."""
+        dropped, healthy = make_connection(usable=False), make_connection()
+        patched_connections.all.return_value = [dropped, healthy]
+
+        request_started.send(sender=self.__class__)
+
+        dropped.close.assert_called_once()
+        healthy.close.assert_not_called()
+
+    def test_checks_skipped(self, patched_connections):
+        """Test closed, unflagged and in-transaction connections."""
+        closed = make_connection(usable=False)
+        closed.connection = None
+        unflagged = make_connection(usable=False, health_checks=False)
+        atomic = make_connection(usable=False, atomic=True)
+        patched_connections.all.return_value = [closed, unflagged, atomic]
+
+        close_unhealthy_connections()
+
+        for conn in (closed, unflagged, atomic):
+            conn.is_usable.assert_not_called()
+            conn.close.assert_not_called()
@@ -0,0 +1,123 @@
+"""
+Tests for the Prometheus metrics endpoint.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import (TestCase, override_settings)
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from core.metrics import mark_dead_workers
+from core.models import Recipe
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def sample(name, **labels):
+    """Return the current value of a metric sample, or 0."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+    """Test metrics are recorded and exported."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'metrics@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+
+    def test_request_metrics_by_route(self):
+        """Test requests are counted per route name and status."""
+        labels = {'route': 'recipe:recipe-list', 'method': 'GET'}
+        count = sample('django_http_request_duration_seconds_count', **labels)
+        responses = sample(
+            'django_http_responses_total', status='200', **labels)
+        queries = sample('django_db_queries_total', alias='default')
+
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(sample(
+            'django_http_request_duration_seconds_count', **labels),
+            count + 1)
+        self.assertEqual(sample(
+            'django_http_responses_total', status='200', **labels),
+            responses + 1)
+        self.assertGreater(
+            sample('django_db_queries_total', alias='default'), queries)
+
+    def test_cache_metrics(self):
+        """Test tag list cache lookups are counted as hits and misses."""
+        hits = sample('app_cache_requests_total', cache='attr', result='hit')
+
+        self.client.get(reverse('recipe:tag-list'))
+        self.client.get(reverse('recipe:tag-list'))
+
+        self.assertEqual(sample(
+            'app_cache_requests_total', cache='attr', result='hit'),
+            hits + 1)
+
+    @override_settings(DEBUG=True)
+    def test_export_metrics(self):
+        """Test the endpoint exports metrics in the text format."""
+        Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('django_http_requests_in_progress', body)
+        self.assertIn('route="recipe:recipe-list"', body)
+        self.assertIn('recipe_image_upload_bytes_bucket', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Test a configured token is required to read metrics."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_metrics_refused_without_token(self):
+        """Test metrics are not public when no token is configured."""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 403)
+
+
+class DeadWorkerTests(TestCase):
+    """Test the samples of exited workers are cleaned up."""
+
+    def test_dead_worker_live_gauges_removed(self):
+        """Test live gauges of dead workers go, counters stay."""
+        dead = subprocess.Popen([sys.executable, '-c', ''])
+        dead.wait()
+        with tempfile.TemporaryDirectory() as path:
+            names = [
+                f'gauge_livesum_{dead.pid}.db',
+                f'gauge_livesum_{os.getpid()}.db',
+                f'counter_{dead.pid}.db',
+            ]
+            for name in names:
+                open(os.path.join(path, name), 'w').close()
+
+            mark_dead_workers(path)
+
+            self.assertEqual(sorted(os.listdir(path)), sorted(names[1:]))
@@ -0,0 +1,94 @@
+"""
+Tests for the request timing middleware.
+"""
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.test import (AsyncClient, TestCase, override_settings)
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_SLOW_MS=1e9)
+class RequestTimingMiddlewareTests(TestCase):
+    """Test Server-Timing headers and timing log lines."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'timing@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+    def test_server_timing_header(self):
+        """Test sampled responses report every phase."""
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        with self.assertLogs('core.middleware', level='INFO') as logs:
+            res = self.client.get(url)
+
+        header = res['Server-Timing']
+        for name in ('db', 'serializer', 'view', 'render', 'total'):
+            self.assertIn(f'{name};dur=', header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], url)
+        self.assertEqual(record['status'], 200)
+        self.assertIn(f'desc="{record["queries"]} queries"', header)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['serializer_ms'], 0)
+
+    async def test_server_timing_header_asgi(self):
+        """Test requests served through ASGI are timed too."""
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+        url = reverse('user:me')
+
+        with self.assertLogs('core.middleware', level='INFO') as logs:
+            res = await AsyncClient().get(
+                url, authorization=f'Token {token.key}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('total;dur=', res['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], url)
+        self.assertGreater(record['queries'], 0)
+
+    def test_list_serialization_timed(self):
+        """Test the values() list path reports its serialization."""
+        with self.assertLogs('core.middleware', level='INFO') as logs:
+            self.client.get(RECIPES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['serializer_ms'], 0)
+        self.assertLessEqual(record['serializer_ms'], record['render_ms'])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        """Test requests outside the sample are not timed."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_logs_sql(self):
+        """Test requests over the threshold log their queries."""
+        client = APIClient()
+        token = Token.objects.create(user=self.user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        with self.assertLogs('core.middleware', level='WARNING') as logs:
+            client.get(reverse('user:me'))
+
+        self.assertIn('Slow request GET /api/user/me/', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
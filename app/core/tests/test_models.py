@@ -5,6 +5,7 @@ from unittest.mock import patch
 from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 
 from core import models
 
@@ -86,6 +87,16 @@ class ModelTest(TestCase):
 
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user can not have two tags with the same name."""
+        user = create_user()
+        other_user = create_user(email='other@mail.com')
+        models.Tag.objects.create(user=user, name='Tag1')
+        models.Tag.objects.create(user=other_user, name='Tag1')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Tag1')
+
     def test_create_ingredient(self):
         """Test creating an ingredient is successful."""
         user = create_user()
@@ -0,0 +1,86 @@
+"""
+Tests for the read replica database router.
+"""
+from django.core.cache import cache
+from django.test import (SimpleTestCase, override_settings)
+
+from core import (checks, routers)
+from core.models import Recipe
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test reads are routed to replicas only when asked."""
+
+    def setUp(self):
+        cache.clear()
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_default_to_primary(self):
+        """Test reads outside start_replica_reads() are not routed."""
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_replica_reads(self):
+        """Test reads go to a replica until end_replica_reads()."""
+        token = routers.start_replica_reads()
+        try:
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica1')
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            routers.end_replica_reads(token)
+
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_pin_to_primary(self):
+        """Test a pin lasts for the sticky window."""
+        self.assertFalse(routers.is_pinned(1))
+
+        routers.pin_to_primary(1)
+
+        self.assertTrue(routers.is_pinned(1))
+        self.assertFalse(routers.is_pinned(2))
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_pin_disabled(self):
+        """Test a zero sticky window pins nobody."""
+        routers.pin_to_primary(1)
+
+        self.assertFalse(routers.is_pinned(1))
+
+    def test_allow_relation(self):
+        """Test rows from the primary and replicas may be related."""
+        primary, replica = Recipe(), Recipe()
+        primary._state.db, replica._state.db = 'default', 'replica1'
+
+        self.assertTrue(self.router.allow_relation(primary, replica))
+        replica._state.db = 'other'
+        self.assertIsNone(self.router.allow_relation(primary, replica))
+
+
+class ReplicaPinCacheCheckTests(SimpleTestCase):
+    """Test replicas are refused without a shared cache."""
+
+    locmem = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    shared = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': 'memcached:11211',
+    }}
+
+    def test_process_local_cache_rejected(self):
+        """Test replicas with a per-process cache fail the check."""
+        with self.settings(DATABASE_REPLICAS=['replica1'], CACHES=self.locmem):
+            errors = checks.check_replica_pin_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    def test_allowed(self):
+        """Test shared caches, no replicas or no pins pass the check."""
+        for overrides in (
+            {'DATABASE_REPLICAS': ['replica1'], 'CACHES': self.shared},
+            {'DATABASE_REPLICAS': [], 'CACHES': self.locmem},
+            {'DATABASE_REPLICAS': ['replica1'], 'CACHES': self.locmem,
+             'REPLICA_STICKY_SECONDS': 0},
+        ):
+            with self.settings(**overrides):
+                self.assertEqual(checks.check_replica_pin_cache(None), [])
@@ -0,0 +1,24 @@
+"""
+Views for the core app.
+"""
+from django.conf import settings
+from django.http import (HttpResponse, HttpResponseForbidden)
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from core import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """Export the Prometheus metrics of all workers.
+
+    Without a METRICS_TOKEN they are only served while DEBUG is on.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,24 @@
+"""
+Pagination for the recipe APIs.
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over recipes, newest first."""
+    ordering = '-id'
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        """Page in the order the view sorted the queryset by, if any."""
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """Keyset pagination over tags and ingredients by name."""
+    ordering = ('-name', '-id')
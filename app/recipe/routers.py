@@ -0,0 +1,64 @@
+"""
+Routers for the recipe APIs.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.urls import re_path
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.routers import DefaultRouter
+
+from core.asyncdb import database_sync_to_async
+from user.authentication import CachedTokenAuthentication
+
+
+def async_read_view(view):
+    """Return an async view serving view's GET and HEAD requests.
+
+    Reads authenticate on the event loop when the token is cached and
+    then run the DRF view, including rendering, in a pool thread so they
+    do not queue behind each other. Writes run as Django runs any sync
+    view under ASGI.
+    """
+    write = sync_to_async(view)
+
+    def read(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    read = database_sync_to_async(read)
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await write(request, *args, **kwargs)
+        try:
+            auth = await CachedTokenAuthentication().authenticate_async(
+                request)
+        except AuthenticationFailed:
+            auth = None
+        if auth is not None:
+            # Honoured by rest_framework.request.Request in place of the
+            # view's authentication classes.
+            request._force_auth_user, request._force_auth_token = auth
+        return await read(request, *args, **kwargs)
+
+    return async_view
+
+
+class AsyncReadRouter(DefaultRouter):
+    """DefaultRouter serving list and detail routes with async views."""
+
+    async_routes = ('list', 'detail')
+
+    def get_urls(self):
+        urls = super().get_urls()
+        return [
+            re_path(url.pattern.regex.pattern, async_read_view(url.callback),
+                    name=url.name)
+            if url.name and url.name.rsplit('-', 1)[-1] in self.async_routes
+            else url
+            for url in urls
+        ]
@@ -1,5 +1,18 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed
 from rest_framework import serializers
-from core.models import Recipe, Tag, Ingredient
+from core import cache as attr_cache
+from core.models import (
+    RELATED_FIELDS,
+    CollectionVersion,
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core.signals import deferred_search_vectors
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -18,6 +31,70 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredients with the number of recipes using them."""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ('recipe_count',)
+
+
+class TagCountSerializer(TagSerializer):
+    """Serializer for tags with the number of recipes using them."""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('recipe_count',)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer for many recipes, creating them in bulk."""
+
+    def create(self, validated_data):
+        """Create recipes with their tags and ingredients in bulk.
+
+        Nested names for every row are resolved together, then recipes
+        and their links are inserted in BULK_IMPORT_BATCH_SIZE batches.
+        """
+        if not validated_data:
+            return []
+        user = self.context['request'].user
+        batch_size = settings.BULK_IMPORT_BATCH_SIZE
+        related = {'tags': Tag, 'ingredients': Ingredient}
+        names = {field: [] for field in related}
+        recipes = []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            for field in related:
+                names[field].append(list(dict.fromkeys(
+                    item['name'] for item in attrs.pop(field, []))))
+            recipes.append(Recipe(**attrs))
+
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+            for field, model in related.items():
+                wanted = {name for row in names[field] for name in row}
+                if not wanted:
+                    continue
+                name_map = self.child._resolve_names(model, wanted)
+                descriptor = getattr(Recipe, field)
+                target = f'{descriptor.field.m2m_reverse_field_name()}_id'
+                descriptor.through.objects.bulk_create([
+                    descriptor.through(
+                        **{'recipe_id': recipe.pk, target: name_map[name]})
+                    for recipe, row in zip(recipes, names[field])
+                    for name in row
+                ], batch_size=batch_size)
+                # Links were written directly, so no m2m_changed was sent.
+                attr_cache.bump_version(model, user.id)
+            Recipe.objects.filter(
+                id__in=[recipe.pk for recipe in recipes],
+            ).update_search_vector()
+            # Nor did bulk_create; this joins the transaction's one bump.
+            CollectionVersion.objects.bump_on_commit(user.id)
+        return recipes
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for recipes."""
     tags = TagSerializer(many=True, required=False)
@@ -26,49 +103,139 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'time_minutes',
-                  'price', 'link', 'tags', 'ingredients')
-        read_only_fields = ('id',)
+                  'price', 'link', 'tags', 'ingredients', 'thumbnail')
+        read_only_fields = ('id', 'thumbnail')
+        list_serializer_class = RecipeListSerializer
+
+    def get_fields(self):
+        """Apply the fields and expand options from the context.
 
-    def _get_or_create_tag(self, tags, recipe):
-        """Handle getting and creating tags as needed."""
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=self.context['request'].user, **tag,)
-            recipe.tags.add(tag_obj)
-
-    def _get_or_create_ingredient(self, ingredients, recipe):
-        """Handle getting and creating ingredients as needed."""
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=self.context['request'].user, **ingredient,
+        Only fields named in fields are kept. With expand given, tags and
+        ingredients not named in it are returned as lists of IDs.
+        """
+        fields = super().get_fields()
+        wanted = self.context.get('fields')
+        if wanted:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in wanted
+            }
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name in RELATED_FIELDS:
+                if name in fields and name not in expand:
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        many=True, read_only=True)
+        return fields
+
+    def _resolve_names(self, model, names):
+        """Return a name -> id map of the user's objects covering names.
+
+        Only the given names are looked up; any that are missing are
+        inserted with a single bulk_create and read back.
+        """
+        user = self.context['request'].user
+        name_map = dict(model.objects.filter(
+            user=user, name__in=names).values_list('name', 'id'))
+        missing = [name for name in names if name not in name_map]
+        if missing:
+            # Names inserted by a concurrent request hit the unique
+            # constraint and are skipped, then picked up by the re-read.
+            model.objects.bulk_create(
+                [model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
             )
-            recipe.ingredients.add(ingredient_obj)
+            name_map.update(model.objects.filter(
+                user=user, name__in=missing).values_list('name', 'id'))
+            # bulk_create sends no post_save, so invalidate here. The
+            # collection version is bumped for the links that follow.
+            attr_cache.bump_version(model, user.id)
+        return name_map
+
+    def _get_or_create_items(self, model, items):
+        """Return ids of the user's objects named in items."""
+        names = list(dict.fromkeys(item['name'] for item in items))
+        if not names:
+            return []
+        name_map = self._resolve_names(model, names)
+        return [name_map[name] for name in names]
+
+    def _set_related(self, recipe, field, ids, created=False):
+        """Point recipe's M2M field at ids, writing only changed links.
 
+        The through rows are written directly, so m2m_changed is sent
+        here the way the related manager would.
+        """
+        manager = getattr(recipe, field)
+        through = manager.through
+        source = f'{manager.source_field_name}_id'
+        target = f'{manager.target_field_name}_id'
+        signal_kwargs = {
+            'sender': through, 'instance': recipe, 'reverse': False,
+            'model': manager.model, 'using': recipe._state.db,
+        }
+        wanted = set(ids)
+        current = set()
+        if not created:
+            current = set(through.objects.filter(
+                **{source: recipe.pk}
+            ).values_list(target, flat=True))
+        stale = current - wanted
+        if stale:
+            through.objects.filter(
+                **{source: recipe.pk, f'{target}__in': stale}
+            ).delete()
+            m2m_changed.send(
+                action='post_remove', pk_set=stale, **signal_kwargs)
+        new = wanted - current
+        if new:
+            through.objects.bulk_create([
+                through(**{source: recipe.pk, target: pk}) for pk in new
+            ])
+            m2m_changed.send(action='post_add', pk_set=new, **signal_kwargs)
+
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tag(tags, recipe)
-        self._get_or_create_ingredient(ingredients, recipe)
+        # The search vector is computed once, after the links are written.
+        with deferred_search_vectors():
+            recipe = Recipe.objects.create(**validated_data)
+            self._set_related(
+                recipe, 'tags',
+                self._get_or_create_items(Tag, tags), created=True)
+            self._set_related(
+                recipe, 'ingredients',
+                self._get_or_create_items(Ingredient, ingredients),
+                created=True)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update recipe."""
-        tags = validated_data.pop('tags', [])
-        ingredients = validated_data.pop('ingredients', [])
-        instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.ingredients.clear()
-        self._get_or_create_tag(tags, instance)
-        self._get_or_create_ingredient(ingredients, instance)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        with deferred_search_vectors():
+            instance = super().update(instance, validated_data)
+            if tags is not None:
+                self._set_related(
+                    instance, 'tags', self._get_or_create_items(Tag, tags))
+            if ingredients is not None:
+                self._set_related(
+                    instance, 'ingredients',
+                    self._get_or_create_items(Ingredient, ingredients))
         return instance
 
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail."""
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ('description', 'image',)
+        fields = RecipeSerializer.Meta.fields + (
+            'description', 'image', 'image_status')
+        # Images are uploaded and processed through upload-image.
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + (
+            'image', 'image_status')
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -76,6 +243,94 @@ class RecipeImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'thumbnail')
+        read_only_fields = ('id', 'image_status', 'thumbnail')
         extra_kwargs = {'image': {'required': True}}
+
+
+class IntegerListField(serializers.ListField):
+    """List of integers given as comma separated query parameters."""
+    child = serializers.IntegerField()
+    default_error_messages = {
+        'invalid': 'Expected a comma separated list of integers.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [data]
+        try:
+            return [
+                int(item) for value in data for item in value.split(',')
+                if item
+            ]
+        except (AttributeError, TypeError, ValueError):
+            self.fail('invalid')
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Serializer validating the recipe list query parameters."""
+    ORDERINGS = ['-id', 'id', 'time_minutes', '-time_minutes', 'price',
+                 '-price']
+    MATCHES = ['any', 'all']
+
+    tags = IntegerListField(required=False)
+    ingredients = IntegerListField(required=False)
+    match = serializers.ChoiceField(
+        choices=MATCHES, required=False, default='any')
+    min_time = serializers.IntegerField(required=False, min_value=0)
+    max_time = serializers.IntegerField(required=False, min_value=0)
+    min_price = serializers.DecimalField(
+        None, None, required=False, min_value=0)
+    max_price = serializers.DecimalField(
+        None, None, required=False, min_value=0)
+    ordering = serializers.ChoiceField(choices=ORDERINGS, required=False)
+
+
+class RecipeAttrFilterSerializer(serializers.Serializer):
+    """Serializer validating the tag and ingredient list parameters."""
+    assigned_only = serializers.BooleanField(required=False, default=False)
+    with_counts = serializers.BooleanField(required=False, default=False)
+
+
+# Columns read by serialize_recipe_rows.
+RECIPE_ROW_COLUMNS = ('id', 'title', 'time_minutes', 'price', 'link',
+                      'thumbnail')
+
+
+def serialize_recipe_rows(rows, request):
+    """Return the RecipeSerializer list output for .values() rows.
+
+    The read-only list path skips ModelSerializer field introspection
+    and model instances: rows hold RECIPE_ROW_COLUMNS and tags and
+    ingredients are read as pre-grouped tuples, one query each.
+    """
+    ids = [row['id'] for row in rows]
+    related = {}
+    for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+        grouped = related[field] = defaultdict(list)
+        if ids:
+            for recipe_id, pk, name in model.objects.filter(
+                    recipe__in=ids).values_list('recipe', 'id', 'name'):
+                grouped[recipe_id].append({'id': pk, 'name': name})
+
+    price = serializers.DecimalField(
+        max_digits=Recipe._meta.get_field('price').max_digits,
+        decimal_places=Recipe._meta.get_field('price').decimal_places,
+    )
+    storage = Recipe._meta.get_field('thumbnail').storage
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'time_minutes': row['time_minutes'],
+            'price': price.to_representation(row['price']),
+            'link': row['link'],
+            'tags': related['tags'][row['id']],
+            'ingredients': related['ingredients'][row['id']],
+            'thumbnail': (
+                request.build_absolute_uri(storage.url(row['thumbnail']))
+                if row['thumbnail'] else None
+            ),
+        }
+        for row in rows
+    ]
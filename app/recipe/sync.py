@@ -0,0 +1,26 @@
+"""
+Checkpoint tokens for the recipe delta sync endpoint.
+
+A checkpoint is the (updated_at, id) position of the last change a
+client has seen, encoded as microseconds since the epoch and the id.
+"""
+from datetime import (datetime, timedelta, timezone)
+
+from rest_framework.exceptions import ValidationError
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_checkpoint(updated_at, recipe_id=0):
+    """Return the checkpoint token for a position."""
+    micros = (updated_at - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}-{recipe_id}'
+
+
+def decode_checkpoint(token):
+    """Return the (updated_at, id) position of a checkpoint token."""
+    try:
+        micros, recipe_id = (int(part) for part in token.split('-'))
+        return EPOCH + timedelta(microseconds=micros), recipe_id
+    except (ValueError, OverflowError):
+        raise ValidationError({'since': 'Invalid checkpoint.'})
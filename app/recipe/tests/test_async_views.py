@@ -0,0 +1,116 @@
+"""
+Tests for the async recipe API routes served under ASGI.
+"""
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import (AsyncClient, TransactionTestCase, override_settings)
+from django.urls import (include, path, reverse)
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import (Recipe, Tag, Ingredient)
+from recipe.routers import AsyncReadRouter
+from recipe.views import (RecipeViewSet, TagViewSet, IngredientViewSet)
+from user.authentication import token_lru
+
+router = AsyncReadRouter()
+router.register('recipes', RecipeViewSet)
+router.register('tags', TagViewSet)
+router.register('ingredients', IngredientViewSet)
+
+urlpatterns = [
+    path('api/recipe/', include((router.urls, 'recipe'))),
+]
+
+
+# Async reads query from pool threads on their own connections, which
+# cannot see the uncommitted rows of a TestCase transaction.
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncReadRouteTests(TransactionTestCase):
+    """Test list and detail routes through the ASGI handler."""
+
+    def setUp(self):
+        # Close pool thread connections after each call so none are left
+        # open when the test database is dropped.
+        patcher = patch.dict(
+            connections['default'].settings_dict, CONN_MAX_AGE=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.async_client = AsyncClient()
+        self.auth = {'authorization': f'Token {self.token.key}'}
+        self.sync_client = APIClient()
+        self.sync_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10,
+            price=Decimal('4.50'))
+        self.recipe.tags.add(tag)
+        self.recipe.ingredients.add(ingredient)
+        token_lru.clear()
+
+    def tearDown(self):
+        token_lru.clear()
+
+    async def test_reads_match_sync_views(self):
+        """Test async list and detail routes return the sync bodies."""
+        urls = [
+            reverse('recipe:recipe-list'),
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+            reverse('recipe:tag-list'),
+            reverse('recipe:ingredient-list'),
+        ]
+        for url in urls:
+            with self.settings(ROOT_URLCONF='app.urls'):
+                expected = (await sync_to_async(self.sync_client.get)(url))
+            expected = expected.content
+            # The first request loads the token, the second hits the LRU.
+            for _ in range(2):
+                res = await self.async_client.get(url, **self.auth)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res.content, expected)
+
+    async def test_conditional_get(self):
+        """Test async reads answer current ETags with 304."""
+        url = reverse('recipe:recipe-list')
+        etag = (
+            await self.async_client.get(url, **self.auth))['ETag']
+
+        res = await self.async_client.get(
+            url, if_none_match=etag, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_bad_token_rejected(self):
+        """Test unknown tokens and anonymous reads are refused."""
+        for headers in ({'authorization': 'Token bad'}, {}):
+            res = await self.async_client.get(
+                reverse('recipe:recipe-list'), **headers)
+
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_writes_pass_through(self):
+        """Test writes on async routes reach the viewset."""
+        payload = {'title': 'Stew', 'time_minutes': 30, 'price': '7.00'}
+
+        res = await self.async_client.post(
+            reverse('recipe:recipe-list'), json.dumps(payload),
+            content_type='application/json', **self.auth,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        exists = Recipe.objects.filter(user=self.user, title='Stew').exists
+        self.assertTrue(await sync_to_async(exists)())
@@ -3,6 +3,7 @@ Tests for the ingredients API.
 """
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 
@@ -43,6 +44,7 @@ class PrivateIngredientApiTest(TestCase):
     """Test unauthenticated API requests."""
 
     def setUp(self):
+        cache.clear()
         self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
@@ -58,7 +60,7 @@ class PrivateIngredientApiTest(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredient_limited_to_user(self):
         """Test list of ingredients limited to authenticated user."""
@@ -70,9 +72,9 @@ class PrivateIngredientApiTest(TestCase):
         res = self.client.get(INGREDIENT_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
-        self.assertEqual(res.data[0]['id'], ingredient.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
+        self.assertEqual(res.data['results'][0]['id'], ingredient.id)
 
     def test_update_ingredient(self):
         """Test updating ingredient."""
@@ -116,8 +118,8 @@ class PrivateIngredientApiTest(TestCase):
         s1 = IngredientSerializer(ing1)
         s2 = IngredientSerializer(ing2)
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtered_ingredients_unique(self):
         """Test filtered ingredient returns a unique list."""
@@ -142,4 +144,47 @@ class PrivateIngredientApiTest(TestCase):
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_assigned_limited_to_user(self):
+        """Test assigned_only never returns other users' ingredients."""
+        other_user = create_user(email='other@example.com')
+        other_ing = Ingredient.objects.create(user=other_user, name='Rice')
+        recipe = Recipe.objects.create(
+            user=other_user,
+            title='Jollof Rice',
+            time_minutes=40,
+            price=Decimal('6.00')
+        )
+        recipe.ingredients.add(other_ing)
+
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_assigned_only_zero_lists_all(self):
+        """Test assigned_only=0 does not filter out unused ingredients."""
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 0})
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_with_counts(self):
+        """Test with_counts returns the number of recipes per ingredient."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        pepper = Ingredient.objects.create(user=self.user, name='Pepper')
+        for title in ('Soup', 'Stew'):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minutes=30,
+                price=Decimal('5.00')
+            )
+            recipe.ingredients.add(salt)
+
+        res = self.client.get(INGREDIENT_URL, {'with_counts': 1})
+
+        counts = {i['id']: i['recipe_count'] for i in res.data['results']}
+        self.assertEqual(counts, {salt.id: 2, pepper.id: 0})
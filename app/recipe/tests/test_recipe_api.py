@@ -1,22 +1,43 @@
 """
 Test for recipe API Test
 """
+import json
 import os
 import tempfile
+from io import StringIO
+from unittest.mock import patch
 
 from PIL import Image
+from prometheus_client import REGISTRY
+from datetime import timedelta
 from decimal import Decimal
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import (connection, connections)
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import (Recipe, Tag, Ingredient)
+from core import images
+from core.images import process_pending
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+    ImageStatus,
+    CollectionVersion,
+)
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import (RecipeSerializer, RecipeDetailSerializer)
 
 RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+BULK_URL = reverse('recipe:recipe-bulk')
+CHANGES_URL = reverse('recipe:recipe-changes')
 
 
 def detail_url(recipe_id):
@@ -84,7 +105,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         """Test list of recipe is limited to authenticated user."""
@@ -102,7 +123,37 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_recipe_list_paginated_by_cursor(self):
+        """Test recipes are returned newest first across cursor pages."""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[2].id, recipes[1].id],
+        )
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipes[0].id])
+        self.assertIsNone(res.data['next'])
+
+    @patch.object(RecipeCursorPagination, 'max_page_size', 2)
+    def test_recipe_page_size_capped(self):
+        """Test page_size can not exceed the configured maximum."""
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
 
     def test_get_recipe_detail(self):
         """Test get recipe detail"""
@@ -274,6 +325,50 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_partial_update_keeps_tags(self):
+        """Test patching other fields leaves recipe tags untouched."""
+        tag = Tag.objects.create(user=self.user, name='Dessert')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        payload = {'title': 'New title'}
+        url = detail_url(recipe.id)
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(tag, recipe.tags.all())
+
+    def test_update_keeps_unchanged_tag_links(self):
+        """Test updating tags only writes links that changed."""
+        tag_lunch = Tag.objects.create(user=self.user, name='Lunch')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_lunch)
+        Through = Recipe.tags.through
+        link = Through.objects.get(recipe=recipe, tag=tag_lunch)
+
+        payload = {'tags': [{'name': 'Lunch'}, {'name': 'Quick'}]}
+        url = detail_url(recipe.id)
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(Through.objects.filter(id=link.id).exists())
+        self.assertEqual(recipe.tags.count(), 2)
+
+    def test_create_recipe_with_duplicate_tags(self):
+        """Test repeated tag names in a payload create a single tag."""
+        payload = {
+            'title': 'Fried Rice',
+            'time_minutes': 25,
+            'price': Decimal('3.00'),
+            'tags': [{'name': 'Dinner'}, {'name': 'Dinner'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(len(res.data['tags']), 1)
+
     def test_create_recipe_with_new_ingredients(self):
         """Test creating recipe with new ingredients."""
         payload = {
@@ -394,9 +489,9 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_tags(self):
         """Test filtering by tags."""
@@ -417,9 +512,779 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_tags_match_all(self):
+        """Test match=all returns only recipes with every tag."""
+        r1 = create_recipe(user=self.user, title='Vegan Curry')
+        r2 = create_recipe(user=self.user, title='Vegan Salad')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [r1.id])
+
+    def test_invalid_link_filters(self):
+        """Test non-integer ids and unknown match modes are rejected."""
+        for params in ({'tags': 'a'}, {'ingredients': '1,x'},
+                       {'match': 'some'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_filter_by_tags_no_duplicates(self):
+        """Test a recipe matching several tags is listed once."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        recipe.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipe.id])
+
+    def test_search_ranks_matches(self):
+        """Test search returns matching recipes, best match first."""
+        in_title = create_recipe(user=self.user, title='Green curry')
+        in_description = create_recipe(
+            user=self.user, title='Rice bowl',
+            description='Serve with a spoon of curry paste.')
+        create_recipe(user=self.user, title='Pancakes')
+        create_recipe(user=create_user(email='other@example.com',
+                                       password='test123'),
+                      title='Curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curries'})
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [in_title.id, in_description.id],
+        )
+
+    def test_search_tag_and_ingredient_names(self):
+        """Test search follows tag and ingredient links and renames."""
+        recipe = create_recipe(user=self.user, title='Dinner')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        for term in ('vegan', 'tofu'):
+            res = self.client.get(RECIPES_URL, {'search': term})
+            self.assertEqual(
+                [r['id'] for r in res.data['results']], [recipe.id])
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        ingredient.delete()
+
+        for term, expected in (('vegan', []), ('vegetarian', [recipe.id]),
+                               ('tofu', [])):
+            res = self.client.get(RECIPES_URL, {'search': term})
+            self.assertEqual(
+                [r['id'] for r in res.data['results']], expected)
+
+    def test_search_vector_computed_once(self):
+        """Test a create computes the vector once, without a touch."""
+        payload = {
+            'title': 'Dinner',
+            'time_minutes': 30,
+            'price': '5.00',
+            'tags': [{'name': 'Vegan'}],
+            'ingredients': [{'name': 'Tofu'}],
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE') and
+            '"search_vector" =' in query['sql']
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"updated_at" =', updates[0])
+        for term in ('dinner', 'vegan', 'tofu'):
+            res = self.client.get(RECIPES_URL, {'search': term})
+            self.assertEqual(len(res.data['results']), 1, term)
+
+    def test_search_after_reverse_clear(self):
+        """Test clearing a tag's recipes updates only those recipes."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        linked = create_recipe(user=self.user, title='Dinner')
+        linked.tags.add(tag)
+        other = create_recipe(user=self.user, title='Lunch')
+
+        tag.recipe_set.clear()
+
+        res = self.client.get(RECIPES_URL, {'search': 'vegan'})
+        self.assertEqual(res.data['results'], [])
+        updated_at = other.updated_at
+        other.refresh_from_db()
+        self.assertEqual(other.updated_at, updated_at)
+
+    def test_search_with_filters(self):
+        """Test search combines with tag filters."""
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        tagged = create_recipe(user=self.user, title='Tomato soup')
+        tagged.tags.add(tag)
+        create_recipe(user=self.user, title='Tomato salad')
+
+        res = self.client.get(
+            RECIPES_URL, {'search': 'tomato', 'tags': str(tag.id)})
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [tagged.id])
+
+    def test_search_paginated_by_rank(self):
+        """Test search results page by rank without repeats."""
+        recipes = [
+            create_recipe(user=self.user, title='Soup'),
+            create_recipe(user=self.user, title='Soup',
+                          description='Soup of the day.'),
+            create_recipe(user=self.user, title='Bread',
+                          description='Dip in soup.'),
+        ]
+
+        res = self.client.get(RECIPES_URL, {'search': 'soup', 'page_size': 2})
+        ids = [r['id'] for r in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(
+            ids, [recipes[1].id, recipes[0].id, recipes[2].id])
+        self.assertIsNone(res.data['next'])
+
+    def test_search_fallback_without_postgres(self):
+        """Test other databases fall back to substring matching."""
+        recipe = create_recipe(user=self.user, title='Dinner')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        create_recipe(user=self.user, title='Lunch')
+
+        with patch.object(connection, 'vendor', 'sqlite'):
+            res = self.client.get(RECIPES_URL, {'search': 'vega'})
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipe.id])
+
+    def test_filter_by_time_and_price_range(self):
+        """Test min/max time and price filters compose with tags."""
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        match = create_recipe(
+            user=self.user, time_minutes=20, price=Decimal('8.00'))
+        match.tags.add(tag)
+        too_slow = create_recipe(
+            user=self.user, time_minutes=90, price=Decimal('8.00'))
+        too_slow.tags.add(tag)
+        too_cheap = create_recipe(
+            user=self.user, time_minutes=20, price=Decimal('1.00'))
+        too_cheap.tags.add(tag)
+        create_recipe(user=self.user, time_minutes=20, price=Decimal('8.00'))
+
+        params = {
+            'min_time': 10,
+            'max_time': 30,
+            'min_price': '5',
+            'max_price': '1000',
+            'tags': str(tag.id),
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']], [match.id])
+
+    def test_ordering_paginated(self):
+        """Test ordering by price pages through ties by id."""
+        cheap = create_recipe(user=self.user, price=Decimal('1.00'))
+        pricey = create_recipe(user=self.user, price=Decimal('9.00'))
+        tied = [create_recipe(user=self.user, price=Decimal('5.00'))
+                for _ in range(2)]
+
+        ids = []
+        res = self.client.get(
+            RECIPES_URL, {'ordering': '-price', 'page_size': 1})
+        while True:
+            ids += [r['id'] for r in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            ids, [pricey.id, tied[1].id, tied[0].id, cheap.id])
+
+    def test_invalid_range_and_ordering(self):
+        """Test bad range values and unknown orderings are rejected."""
+        for params in ({'max_time': 'soon'}, {'min_price': '-1'},
+                       {'ordering': 'description'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_sparse_fields(self):
+        """Test fields limits the output and skips unused prefetches."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(
+            res.data['results'], [{'id': recipe.id, 'title': recipe.title}])
+        self.assertFalse(any(
+            'core_tag' in query['sql'] for query in ctx.captured_queries))
+
+    def test_compact_related_ids(self):
+        """Test an empty expand returns tags and ingredients as ids."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPES_URL, {'expand': ''})
+
+        self.assertEqual(res.data['results'][0]['tags'], [tag.id])
+        self.assertEqual(
+            res.data['results'][0]['ingredients'], [ingredient.id])
+
+        res = self.client.get(RECIPES_URL, {'expand': 'tags'})
+
+        self.assertEqual(
+            res.data['results'][0]['tags'], [{'id': tag.id, 'name': 'Vegan'}])
+        self.assertEqual(
+            res.data['results'][0]['ingredients'], [ingredient.id])
+
+    def test_sparse_fields_detail_and_export(self):
+        """Test fields and expand also apply to detail and export."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        params = {'fields': 'description,tags', 'expand': ''}
+
+        res = self.client.get(detail_url(recipe.id), params)
+
+        self.assertEqual(
+            res.data, {'description': recipe.description, 'tags': [tag.id]})
+
+        res = self.client.get(EXPORT_URL, params)
+
+        self.assertEqual(
+            json.loads(b''.join(res.streaming_content)),
+            [{'description': recipe.description, 'tags': [tag.id]}],
+        )
+
+    def test_export_json(self):
+        """Test exporting recipes streams a JSON array of details."""
+        other_user = create_user(email='other@example.com', password='p')
+        create_recipe(user=other_user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        recipes[0].tags.add(tag)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        data = json.loads(b''.join(res.streaming_content))
+        serializer = RecipeDetailSerializer(reversed(recipes), many=True)
+        self.assertEqual(data, json.loads(json.dumps(serializer.data)))
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as one JSON object per line."""
+        recipes = [create_recipe(user=self.user) for _ in range(2)]
+
+        res = self.client.get(EXPORT_URL, {'output': 'ndjson'})
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [recipes[1].id, recipes[0].id],
+        )
+
+    def test_export_empty(self):
+        """Test exporting with no recipes streams an empty array."""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(json.loads(b''.join(res.streaming_content)), [])
+
+    def test_bulk_create_recipes(self):
+        """Test bulk import creates valid rows and reports bad ones."""
+        Tag.objects.create(user=self.user, name='Dinner')
+        payload = [
+            {
+                'title': 'Stew',
+                'time_minutes': 60,
+                'price': '7.50',
+                'tags': [{'name': 'Dinner'}, {'name': 'Slow'}],
+                'ingredients': [{'name': 'Beef'}],
+            },
+            {'title': 'Missing price', 'time_minutes': 5},
+            {
+                'title': 'Soup',
+                'time_minutes': 30,
+                'price': '3.00',
+                'tags': [{'name': 'Dinner'}],
+            },
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 1)
+        results = res.data['results']
+        self.assertEqual(
+            [r['status'] for r in results], ['created', 'error', 'created'])
+        self.assertIn('price', results[1]['errors'])
+        stew = Recipe.objects.get(id=results[0]['id'])
+        self.assertEqual(stew.user, self.user)
+        self.assertEqual(
+            sorted(stew.tags.values_list('name', flat=True)),
+            ['Dinner', 'Slow'],
+        )
+        self.assertEqual(stew.ingredients.get().name, 'Beef')
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_ndjson(self):
+        """Test bulk import accepts newline-delimited JSON."""
+        rows = [
+            {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.00'}
+            for i in range(3)
+        ]
+        body = '\n'.join(json.dumps(row) for row in rows) + '\n'
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 3)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_create_all_invalid(self):
+        """Test bulk import with no valid rows returns 400."""
+        res = self.client.post(BULK_URL, [{'title': ''}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['created'], 0)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test bulk import rejects a single object."""
+        payload = {'title': 'Stew', 'time_minutes': 60, 'price': '7.50'}
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BULK_IMPORT_MAX_ROWS=1)
+    def test_bulk_create_row_limit(self):
+        """Test bulk import rejects requests over the row limit."""
+        row = {'title': 'Stew', 'time_minutes': 60, 'price': '7.50'}
+
+        res = self.client.post(BULK_URL, [row, row], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+
+@override_settings(SYNC_CHECKPOINT_LAG=0)
+class DeltaSyncTests(TestCase):
+    """Test the recipe changes endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+
+    def _ids(self, res):
+        return [recipe['id'] for recipe in res.data['changed']]
+
+    def test_full_then_delta_sync(self):
+        """Test a checkpoint returns only changes and tombstones."""
+        kept, updated, deleted = [
+            create_recipe(user=self.user) for _ in range(3)]
+        create_recipe(user=create_user(email='other@example.com',
+                                       password='test123'))
+
+        res = self.client.get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(res), [kept.id, updated.id, deleted.id])
+        self.assertEqual(res.data['deleted'], [])
+        self.assertFalse(res.data['more'])
+
+        updated.title = 'New title'
+        updated.save()
+        deleted_id = deleted.id
+        deleted.delete()
+        created = create_recipe(user=self.user)
+
+        res = self.client.get(CHANGES_URL, {'since': res.data['checkpoint']})
+
+        self.assertEqual(self._ids(res), [updated.id, created.id])
+        self.assertEqual(res.data['changed'][0]['title'], 'New title')
+        self.assertEqual(res.data['deleted'], [deleted_id])
+
+        res = self.client.get(CHANGES_URL, {'since': res.data['checkpoint']})
+
+        self.assertEqual(self._ids(res), [])
+        self.assertEqual(res.data['deleted'], [])
+
+    def test_linked_changes_are_synced(self):
+        """Test renaming a tag reports the recipes using it."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        checkpoint = self.client.get(CHANGES_URL).data['checkpoint']
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(CHANGES_URL, {'since': checkpoint})
+
+        self.assertEqual(self._ids(res), [recipe.id])
+        self.assertEqual(
+            res.data['changed'][0]['tags'][0]['name'], 'Vegetarian')
+
+    @override_settings(SYNC_MAX_CHANGES=2)
+    def test_sync_in_batches(self):
+        """Test large syncs continue from the last returned change."""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(CHANGES_URL)
+
+        self.assertTrue(res.data['more'])
+        self.assertEqual(self._ids(res), [recipes[0].id, recipes[1].id])
+
+        res = self.client.get(CHANGES_URL, {'since': res.data['checkpoint']})
+
+        self.assertFalse(res.data['more'])
+        self.assertEqual(self._ids(res), [recipes[2].id])
+
+    @override_settings(SYNC_MAX_CHANGES=2, SYNC_CHECKPOINT_LAG=30)
+    def test_batch_checkpoint_trails_clock(self):
+        """Test a page of recent changes does not skip later commits."""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(CHANGES_URL)
+
+        self.assertFalse(res.data['more'])
+        self.assertEqual(self._ids(res), [recipes[0].id, recipes[1].id])
+
+        # Committed after the first page, but stamped before its end.
+        late = create_recipe(user=self.user)
+        Recipe.objects.filter(id=late.id).update(
+            updated_at=recipes[1].updated_at - timedelta(seconds=1))
+        res = self.client.get(CHANGES_URL, {'since': res.data['checkpoint']})
+
+        self.assertIn(late.id, self._ids(res))
+
+    def test_invalid_and_expired_checkpoints(self):
+        """Test bad checkpoints are rejected and old ones expire."""
+        res = self.client.get(CHANGES_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(CHANGES_URL, {'since': '0-0'})
+
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+
+class FastRecipeListTests(TestCase):
+    """Test the values() and orjson recipe list path."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='Café')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = create_recipe(
+            user=self.user, title='Crème brûlée \u2028 \U0001f36e',
+            price=Decimal('12.05'))
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        recipe.thumbnail = 'uploads/recipe/thumbnails/sample.jpg'
+        recipe.save()
+        create_recipe(user=self.user, title='Plain', link='')
+        self.params = {'page_size': 100}
+        self.full_fields = ','.join(RecipeSerializer.Meta.fields)
+
+    def assert_matches_serializer(self):
+        """Assert the fast page equals the serializer-rendered page."""
+        res = self.client.get(RECIPES_URL, self.params)
+        slow = self.client.get(
+            RECIPES_URL, {**self.params, 'fields': self.full_fields})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, slow.content)
+        self.assertEqual(len(res.json()['results']), 2)
+
+    def test_list_matches_serializer(self):
+        """Test the fast list renders the same bytes as the serializer."""
+        self.assert_matches_serializer()
+
+    def test_list_without_orjson(self):
+        """Test the stdlib renderer is used when orjson is missing."""
+        with patch('recipe.renderers.orjson', None):
+            self.assert_matches_serializer()
+
+    def test_list_browsable_api(self):
+        """Test HTML requests still render through the serializer."""
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertContains(res, 'Crème brûlée')
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling of recipe endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        # Versions are bumped on commit, which TestCase never reaches.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = create_recipe(user=self.user)
+
+    def test_list_not_modified(self):
+        """Test a current ETag is answered with 304 and no body."""
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_changes_invalidate_etag(self):
+        """Test writes, link changes and renames change the ETag."""
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(user=self.user, name='Vegan')
+        changes = [
+            lambda: create_recipe(user=self.user),
+            lambda: self.recipe.tags.add(tag),
+            lambda: Tag.objects.filter(pk=tag.pk).first().save(),
+            lambda: self.recipe.delete(),
+        ]
+        etag = self.client.get(RECIPES_URL)['ETag']
+        for change in changes:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(res['ETag'], etag)
+            etag = res['ETag']
+
+    def test_create_bumps_version_once(self):
+        """Test one create with tags and ingredients bumps once."""
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '5.00',
+            'tags': [{'name': 'Indian'}, {'name': 'Dinner'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+        version = CollectionVersion.objects.current(self.user.id)[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            CollectionVersion.objects.current(self.user.id)[0], version + 1)
+
+    def test_etag_depends_on_query(self):
+        """Test different pages and filters do not share an ETag."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        res = self.client.get(
+            RECIPES_URL, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_if_modified_since(self):
+        """Test Last-Modified is honoured through If-Modified-Since."""
+        url = detail_url(self.recipe.id)
+        last_modified = self.client.get(url)['Last-Modified']
+
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_link_changes_touch_recipe(self):
+        """Test link changes and tag renames update updated_at."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        updated_at = self.recipe.updated_at
+
+        self.recipe.tags.add(tag)
+        self.recipe.refresh_from_db()
+
+        self.assertGreater(self.recipe.updated_at, updated_at)
+        updated_at = self.recipe.updated_at
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        self.recipe.refresh_from_db()
+
+        self.assertGreater(self.recipe.updated_at, updated_at)
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test recipe endpoints run a constant number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='queries@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Dinner')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt')
+
+    def _create_recipes(self, count):
+        """Create count recipes, each with a tag and an ingredient."""
+        recipes = []
+        for _ in range(count):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+            recipes.append(recipe)
+        return recipes
+
+    def _count_queries(self, url):
+        """Fetch url and return the number of queries it ran."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url_for, sizes=(1, 5, 20)):
+        """Assert url_for() costs the same number of queries at each size."""
+        counts = []
+        created = 0
+        for size in sizes:
+            self._create_recipes(size - created)
+            created = size
+            counts.append(self._count_queries(url_for()))
+        self.assertEqual(len(set(counts)), 1, counts)
+        return counts[0]
+
+    def test_list_query_count_constant(self):
+        """Test listing recipes does not query per recipe."""
+        num_queries = self.assertConstantQueries(lambda: RECIPES_URL)
+
+        # Collection version, recipes, tags, ingredients.
+        self.assertEqual(num_queries, 4)
+
+    def test_detail_query_count_constant(self):
+        """Test retrieving a recipe does not depend on collection size."""
+        num_queries = self.assertConstantQueries(
+            lambda: detail_url(Recipe.objects.latest('id').id))
+
+        self.assertEqual(num_queries, 4)
+
+    def test_create_query_count_independent_of_items(self):
+        """Test nested tags and ingredients are written in bulk."""
+        def payload(count):
+            return {
+                'title': 'Stew',
+                'time_minutes': 30,
+                'price': Decimal('5.00'),
+                'tags': [{'name': f'Tag {count} {i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'Ingredient {count} {i}'} for i in range(count)
+                ],
+            }
+
+        counts = []
+        for count in (2, 30):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(
+                    RECIPES_URL, payload(count), format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_create_looks_up_only_named_items(self):
+        """Test nested names are resolved without loading every tag."""
+        Tag.objects.bulk_create(
+            [Tag(user=self.user, name=f'Tag {i}') for i in range(20)])
+        payload = {
+            'title': 'Stew',
+            'time_minutes': 30,
+            'price': '5.00',
+            'tags': [{'name': 'Dinner'}, {'name': 'Winter'}],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT "core_tag"."name"')
+        ]
+        self.assertTrue(lookups)
+        for sql in lookups:
+            self.assertIn('"core_tag"."name" IN', sql)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_prefetches_per_chunk(self):
+        """Test export runs two prefetch queries per chunk of recipes."""
+        self._create_recipes(5)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(EXPORT_URL)
+            rows = json.loads(b''.join(res.streaming_content))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(len(ctx.captured_queries), 1 + 2 * 3)
+
+    def test_bulk_create_query_count_independent_of_rows(self):
+        """Test bulk import cost does not grow with the number of rows."""
+        def payload(count):
+            return [
+                {
+                    'title': f'Recipe {i}',
+                    'time_minutes': 10,
+                    'price': '2.00',
+                    'tags': [{'name': f'Tag {i % 3}'}],
+                    'ingredients': [{'name': f'Ingredient {i}'}],
+                }
+                for i in range(count)
+            ]
+
+        counts = []
+        for count in (2, 40):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(BULK_URL, payload(count), format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
 
 
 class ImageUploadTest(TestCase):
@@ -435,21 +1300,35 @@ class ImageUploadTest(TestCase):
         self.recipe = create_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
         self.recipe.image.delete()
+        self.recipe.thumbnail.delete()
 
-    def test_upload_image(self):
-        """Test an image upload to a recipe"""
+    def _upload(self, size=(10, 10), orientation=None):
+        """Upload a JPEG of size to the recipe and return the response."""
         url = image_upload_url(self.recipe.id)
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
         with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
-            img = Image.new('RGB', (10, 10))
-            img.save(image_file, format='JPEG')
+            img = Image.new('RGB', size)
+            img.save(image_file, format='JPEG', exif=exif.tobytes())
             image_file.seek(0)
             payload = {'image': image_file}
-            res = self.client.post(url, payload, format='multipart')
+            return self.client.post(url, payload, format='multipart')
+
+    def test_upload_image(self):
+        """Test an image upload to a recipe"""
+        uploads = REGISTRY.get_sample_value('recipe_image_upload_bytes_count')
+
+        res = self._upload()
 
+        self.assertEqual(REGISTRY.get_sample_value(
+            'recipe_image_upload_bytes_count'), uploads + 1)
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], ImageStatus.PENDING)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
     def test_upload_image_bad_request(self):
@@ -459,3 +1338,125 @@ class ImageUploadTest(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(IMAGE_MAX_SIZE=40, IMAGE_THUMBNAIL_SIZE=10)
+    def test_process_uploaded_image(self):
+        """Test the worker resizes, strips EXIF and makes a thumbnail."""
+        self._upload(size=(80, 20), orientation=6)
+        self.recipe.refresh_from_db()
+        original_path = self.recipe.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_images', once=True, stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+        self.assertFalse(os.path.exists(original_path))
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.size, (10, 40))
+            self.assertEqual(len(img.getexif()), 0)
+        with Image.open(self.recipe.thumbnail.path) as img:
+            self.assertEqual(max(img.size), 10)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertTrue(res.data['thumbnail'].endswith(
+            self.recipe.thumbnail.name))
+
+    @override_settings(SYNC_CHECKPOINT_LAG=0)
+    def test_processed_images_are_synced(self):
+        """Test delta syncs report images the worker finished or failed."""
+        self._upload()
+        broken = create_recipe(user=self.user)
+        broken.image.save('broken.jpg', ContentFile(b'not an image'))
+        broken.image_status = ImageStatus.PENDING
+        broken.save()
+        self.addCleanup(broken.image.delete, save=False)
+        checkpoint = self.client.get(CHANGES_URL).data['checkpoint']
+
+        with self.assertLogs('core.images', level='ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_pending(), 2)
+        res = self.client.get(CHANGES_URL, {'since': checkpoint})
+
+        changed = {recipe['id']: recipe for recipe in res.data['changed']}
+        self.assertEqual(set(changed), {self.recipe.id, broken.id})
+        self.recipe.refresh_from_db()
+        self.assertTrue(changed[self.recipe.id]['thumbnail'].endswith(
+            self.recipe.thumbnail.name))
+
+    def test_process_unreadable_image_fails(self):
+        """Test an image the worker can not decode is marked failed."""
+        self.recipe.image.save('broken.jpg', ContentFile(b'not an image'))
+        self.recipe.image_status = ImageStatus.PENDING
+        self.recipe.save()
+
+        with self.assertLogs('core.images', level='ERROR'):
+            self.assertEqual(process_pending(), 1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+
+    def test_process_decompression_bomb_fails(self):
+        """Test an image too large to decode is marked failed."""
+        self._upload(size=(80, 80))
+
+        with patch.object(Image, 'MAX_IMAGE_PIXELS', 100), \
+                self.assertLogs('core.images', level='ERROR'):
+            self.assertEqual(process_pending(), 1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+
+    def test_process_deletes_originals_on_commit(self):
+        """Test replaced files are kept until the worker commits."""
+        self._upload()
+        self.recipe.refresh_from_db()
+        original_path = self.recipe.image.path
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(process_pending(), 1)
+
+        self.assertTrue(os.path.exists(original_path))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(os.path.exists(original_path))
+
+    def test_process_skips_claimed_image(self):
+        """Test an image claimed by another worker is left alone."""
+        self._upload()
+        other = connections.create_connection('default')
+        self.addCleanup(other.close)
+        with other.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s, %s)',
+                           [images.IMAGE_LOCK_CLASS, self.recipe.id])
+
+        self.assertEqual(process_pending(), 0)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.PENDING)
+
+    def test_process_discards_replaced_upload(self):
+        """Test a result is dropped if a new upload arrives meanwhile."""
+        self._upload()
+        self.recipe.refresh_from_db()
+        self.addCleanup(self.recipe.image.delete, save=False)
+        processed = []
+        process_recipe_image = images.process_recipe_image
+
+        def process_then_replace(recipe):
+            process_recipe_image(recipe)
+            processed.extend([recipe.image.path, recipe.thumbnail.path])
+            Recipe.objects.filter(pk=recipe.pk).update(image='new.jpg')
+
+        with patch('core.images.process_recipe_image',
+                   side_effect=process_then_replace), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_pending(), 0)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, 'new.jpg')
+        self.assertEqual(self.recipe.image_status, ImageStatus.PENDING)
+        self.assertEqual(len(processed), 2)
+        for path in processed:
+            self.assertFalse(os.path.exists(path))
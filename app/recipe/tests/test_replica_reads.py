@@ -0,0 +1,130 @@
+"""
+Tests for routing recipe API reads to read replicas.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import (connections, transaction)
+from django.test import (TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import (Recipe, Tag, Ingredient)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+# replica1 mirrors the test database on a connection of its own, which
+# cannot see the uncommitted rows of a TestCase transaction.
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaReadTests(TransactionTestCase):
+    """Test safe list and retrieve requests read from the replica."""
+
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(connections['replica1'].close)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10,
+            price=Decimal('4.50'))
+        self.tag = Tag.objects.create(user=self.user, name='Hot')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt'))
+
+    def get(self, url):
+        """GET url, returning the response and the replica's queries."""
+        with CaptureQueriesContext(connections['replica1']) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, queries
+
+    def test_reads_use_replica(self):
+        """Test list and retrieve actions query the replica."""
+        urls = [
+            RECIPES_URL,
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+            reverse('recipe:tag-list'),
+            reverse('recipe:ingredient-list'),
+        ]
+        for url in urls:
+            res, queries = self.get(url)
+
+            self.assertGreater(len(queries), 0, url)
+        self.assertEqual(res.data['results'][0]['name'], 'Salt')
+
+    def test_other_reads_use_primary(self):
+        """Test reads outside list and retrieve stay on the primary."""
+        for url in (reverse('recipe:recipe-export'),
+                    reverse('recipe:recipe-changes')):
+            _, queries = self.get(url)
+
+            self.assertEqual(len(queries), 0, url)
+
+    def test_write_pins_user_to_primary(self):
+        """Test reads after a write go to the primary until it expires."""
+        payload = {'title': 'Stew', 'time_minutes': 30, 'price': '7.00'}
+        with CaptureQueriesContext(connections['replica1']) as queries:
+            res = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(queries), 0)
+
+        res, queries = self.get(RECIPES_URL)
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(res.data['results'][0]['title'], 'Stew')
+
+        cache.clear()
+        _, queries = self.get(RECIPES_URL)
+
+        self.assertGreater(len(queries), 0)
+
+    def test_stale_replica_not_cached_for_writer(self):
+        """Test a lagging replica's reads do not hide the user's writes."""
+        replica = connections['replica1']
+        with transaction.atomic(using='replica1'):
+            # The replica keeps serving this snapshot, taken before the
+            # write, as one lagging behind the primary would.
+            with replica.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            Tag.objects.using('replica1').count()
+            tag_url = reverse('recipe:tag-detail', args=[self.tag.id])
+            res = self.client.patch(tag_url, {'name': 'Cold'})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+            cache.delete(routers._pin_key(self.user.id))
+            res, _ = self.get(reverse('recipe:tag-list'))
+            self.assertEqual(res.data['results'][0]['name'], 'Hot')
+
+            routers.pin_to_primary(self.user.id)
+            res, queries = self.get(reverse('recipe:tag-list'))
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(res.data['results'][0]['name'], 'Cold')
+
+    def test_failed_write_not_pinned(self):
+        """Test rejected writes leave reads on the replica."""
+        res = self.client.post(RECIPES_URL, {'title': ''})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        _, queries = self.get(RECIPES_URL)
+
+        self.assertGreater(len(queries), 0)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test every read uses the primary without replicas."""
+        _, queries = self.get(RECIPES_URL)
+
+        self.assertEqual(len(queries), 0)
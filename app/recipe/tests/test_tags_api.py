@@ -3,6 +3,7 @@ Test for the tags API.
 """
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 
@@ -43,6 +44,7 @@ class PrivateTagApiTest(TestCase):
     """Test authenticated requests."""
 
     def setUp(self):
+        cache.clear()
         self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
@@ -58,7 +60,7 @@ class PrivateTagApiTest(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test list of tags is limited to authenticated user."""
@@ -70,9 +72,55 @@ class PrivateTagApiTest(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
+
+    def test_tags_paginated_by_name(self):
+        """Test tags are paged in reverse name order."""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Breakfast', 'Lunch', 'Dinner')
+        ]
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        ids = [tag['id'] for tag in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [tag['id'] for tag in res.data['results']]
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(ids, [tags[1].id, tags[2].id, tags[0].id])
+
+    def test_tags_list_cached(self):
+        """Test repeated listing is served from cache until tags change."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        # Only the collection version is read.
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+        Tag.objects.create(user=self.user, name='Dessert')
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_tags_list_not_modified(self):
+        """Test the tag list answers a current ETag with 304."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Dessert')
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_update_tag(self):
         """Test updating a tag."""
@@ -89,6 +137,17 @@ class PrivateTagApiTest(TestCase):
 
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to an existing name is rejected."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
     def test_delete_tag(self):
         """Test for deleting tag."""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -117,8 +176,32 @@ class PrivateTagApiTest(TestCase):
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
+
+    def test_filter_flags_parsed_as_booleans(self):
+        """Test boolean words and empty values parse, others are refused."""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Toast', time_minutes=5,
+            price=Decimal('1.00'))
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 'true'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']], [tag.id])
+
+        res = self.client.get(TAGS_URL, {'assigned_only': ''})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+        for name in ('assigned_only', 'with_counts'):
+            res = self.client.get(TAGS_URL, {name: 'maybe'})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_filtered_tags_unique(self):
         """Test filtered tags returns a unique list."""
@@ -143,4 +226,4 @@ class PrivateTagApiTest(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
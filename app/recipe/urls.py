@@ -1,12 +1,14 @@
 """
 URL mappings for recipe app.
 """
+from django.conf import settings
 from django.urls import (path, include)
+from recipe.routers import AsyncReadRouter
 from recipe.views import (RecipeViewSet, TagViewSet, IngredientViewSet)
 
 from rest_framework.routers import DefaultRouter
 
-router = DefaultRouter()
+router = AsyncReadRouter() if settings.ASYNC_VIEWS else DefaultRouter()
 
 router.register('recipes', RecipeViewSet)
 router.register('tags', TagViewSet)
@@ -7,17 +7,111 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
-from functools import reduce
-import operator
-from django.db.models import Q, Count
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (IntegrityError, transaction)
+from django.db.models import (Count, Exists, OuterRef, Q)
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import (http_date, quote_etag)
 from rest_framework import (viewsets, mixins, status)
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import (SAFE_METHODS, IsAuthenticated)
+from rest_framework.renderers import (BrowsableAPIRenderer, JSONRenderer)
+from rest_framework.utils.encoders import JSONEncoder
 
-from core.models import (Recipe, Tag, Ingredient)
+from core import cache as attr_cache
+from core import routers
+from core.metrics import IMAGE_UPLOAD_BYTES
+from core.models import (
+    RELATED_FIELDS,
+    CollectionVersion,
+    Recipe,
+    RecipeTombstone,
+    Tag,
+    Ingredient,
+    ImageStatus,
+)
 from recipe import serializers
+from recipe.parsers import NDJSONParser
+from recipe.renderers import FastJSONRenderer
+from recipe.sync import (decode_checkpoint, encode_checkpoint)
+from user.authentication import CachedTokenAuthentication
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+)
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs before any serialization happens.
+
+    ETag and Last-Modified come from the user's CollectionVersion, which
+    every change to their recipes, tags or ingredients bumps, so one
+    primary key lookup validates any list page or detail.
+    """
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        """Return 304 if the client is current, else handler's response."""
+        version, modified_at = CollectionVersion.objects.current(
+            request.user.id)
+        # Read from the same database as the response (see
+        # ReplicaReadMixin), so it is never newer than the data.
+        self.collection_version = version
+        validator = ':'.join([
+            str(request.user.id), str(version),
+            request.accepted_media_type, request.get_full_path(),
+        ])
+        etag = quote_etag(hashlib.md5(validator.encode()).hexdigest())
+        last_modified = modified_at and int(modified_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class ReplicaReadMixin:
+    """Serve safe list and retrieve requests from a read replica.
+
+    Authentication and permission checks still read the primary. A
+    successful write pins the user to the primary for a few seconds
+    (see core.routers), so their next reads include it.
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.DATABASE_REPLICAS
+                and request.method in SAFE_METHODS
+                and self.action in self.replica_actions
+                and not routers.is_pinned(request.user.id)):
+            self._replica_token = routers.start_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            self._replica_token = None
+            routers.end_replica_reads(token)
+        elif (request.method not in SAFE_METHODS
+              and response.status_code < 400
+              and request.user.is_authenticated):
+            routers.pin_to_primary(request.user.id)
+        return super().finalize_response(
+            request, response, *args, **kwargs)
 
 
 @extend_schema_view(
@@ -32,65 +126,346 @@ from recipe import serializers
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of IDs to filter.',
-            )
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full-text search over titles, descriptions, '
+                            'tags and ingredients, best matches first.',
+            ),
+            OpenApiParameter(
+                'min_time', OpenApiTypes.INT,
+                description='Only recipes taking at least this many '
+                            'minutes.',
+            ),
+            OpenApiParameter(
+                'max_time', OpenApiTypes.INT,
+                description='Only recipes taking at most this many '
+                            'minutes.',
+            ),
+            OpenApiParameter(
+                'min_price', OpenApiTypes.DECIMAL,
+                description='Only recipes costing at least this much.',
+            ),
+            OpenApiParameter(
+                'max_price', OpenApiTypes.DECIMAL,
+                description='Only recipes costing at most this much.',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=serializers.RecipeFilterSerializer.ORDERINGS,
+                description='Sort order, newest (-id) by default or '
+                            'best match first when searching.',
+            ),
+            OpenApiParameter(
+                'fields',
+                OpenApiTypes.STR,
+                description='Comma separated list of fields to return.',
+            ),
+            OpenApiParameter(
+                'expand',
+                OpenApiTypes.STR,
+                description='Comma separated list of tags and ingredients '
+                            'to nest as objects. When given, the others '
+                            'are returned as lists of IDs; pass it empty '
+                            'for a compact response.',
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR,
+                enum=serializers.RecipeFilterSerializer.MATCHES,
+                description='Return recipes with any (default) or all '
+                            'of the requested tags and ingredients.',
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                    viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    range_filters = {
+        'min_time': 'time_minutes__gte',
+        'max_time': 'time_minutes__lte',
+        'min_price': 'price__gte',
+        'max_price': 'price__lte',
+    }
+
+    sparse_actions = ('list', 'retrieve', 'export', 'changes')
+
+    def _param_set(self, name):
+        """Return a comma separated query parameter as a set, or None."""
+        value = self.request.query_params.get(name)
+        if value is None or self.action not in self.sparse_actions:
+            return None
+        return {item for item in value.split(',') if item}
+
+    def _related_fields(self):
+        """Return the M2M fields to load and those wanted as ids only."""
+        fields = self._param_set('fields')
+        expand = self._param_set('expand')
+        related = [
+            field for field in RELATED_FIELDS
+            if not fields or field in fields
+        ]
+        ids_only = [
+            field for field in related
+            if expand is not None and field not in expand
+        ]
+        return related, ids_only
 
-    def _params_to_integer(self, qs):
-        """Convert a list of string to integers."""
-        return [int(str_id) for str_id in qs.split(',')]
+    def get_serializer_context(self):
+        """Pass the requested sparse fieldset to the serializer."""
+        context = super().get_serializer_context()
+        context['fields'] = self._param_set('fields')
+        context['expand'] = self._param_set('expand')
+        return context
 
     def get_queryset(self):
         """Retrieve recipes for authenticated users."""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
+        search = self.request.query_params.get('search')
+        params = serializers.RecipeFilterSerializer(
+            data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        match_all = params.validated_data['match'] == 'all'
         queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_integer(tags)
-            tag_queries = [Q(tags__id=id) for id in tag_ids]
-            queryset = queryset.filter(reduce(operator.or_, tag_queries))
-        if ingredients:
-            ingredient_ids = self._params_to_integer(ingredients)
-            ingredient_queries = [Q(ingredients__id=id)
-                                  for id in ingredient_ids]
-            queryset = queryset.filter(
-                reduce(operator.or_, ingredient_queries))
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        if self.action in ('list', 'retrieve', 'changes'):
+            queryset = queryset.with_related(*self._related_fields())
+        for field in RELATED_FIELDS:
+            ids = params.validated_data.get(field)
+            if ids:
+                queryset = queryset.linked_to(field, ids, match_all)
+        for param, lookup in self.range_filters.items():
+            if param in params.validated_data:
+                queryset = queryset.filter(
+                    **{lookup: params.validated_data[param]})
+        queryset = queryset.for_user(self.request.user)
+
+        ordering = ('-id',)
+        if search:
+            queryset = queryset.search(search)
+            ordering = ('-rank', '-id')
+        if 'ordering' in params.validated_data:
+            # Ties are broken by id in the same direction, so the
+            # (user, field, id) indexes serve both directions.
+            field = params.validated_data['ordering']
+            ordering = (field, '-id' if field.startswith('-') else 'id')
+        return queryset.order_by(*dict.fromkeys(ordering))
 
     def get_serializer_class(self):
         """Return serializer class for request."""
-        if self.action == 'list':
+        if self.action in ('list', 'changes'):
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
 
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        """List recipes, or answer 304 if the client is current."""
+        return self._conditional(self._list, request, *args, **kwargs)
+
+    def _list(self, request, *args, **kwargs):
+        """List recipes, rendering plain JSON pages from .values() rows."""
+        sparse = (self._param_set('fields') is not None
+                  or self._param_set('expand') is not None)
+        if sparse or not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = serializers.RECIPE_ROW_COLUMNS
+        # Cursor positions are read from the ordering columns.
+        ordering = [
+            field.lstrip('-') for field in queryset.query.order_by
+            if field.lstrip('-') not in columns
+        ]
+        rows = queryset.prefetch_related(None).values(*columns, *ordering)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(
+            serializers.serialize_recipe_rows(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe, or answer 304 if the client is current."""
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload and images to recipe."""
+        """Upload an image to recipe and queue it for processing."""
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            image = serializer.validated_data.get('image')
+            if image:
+                IMAGE_UPLOAD_BYTES.observe(image.size)
+            serializer.save(image_status=ImageStatus.PENDING)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _export_lines(self, queryset, ndjson):
+        """Yield the serialized recipes as NDJSON lines or a JSON array."""
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        recipes = queryset.iterator_with_related(
+            settings.EXPORT_CHUNK_SIZE, *self._related_fields())
+        rows = (
+            json.dumps(serializer_class(recipe, context=context).data,
+                       cls=JSONEncoder)
+            for recipe in recipes
+        )
+        if ndjson:
+            for row in rows:
+                yield row + '\n'
+        else:
+            yield '['
+            for index, row in enumerate(rows):
+                yield ',' + row if index else row
+            yield ']'
+
+    @extend_schema(
+        request=serializers.RecipeDetailSerializer(many=True),
+        responses={
+            status.HTTP_201_CREATED: OpenApiTypes.OBJECT,
+            status.HTTP_207_MULTI_STATUS: OpenApiTypes.OBJECT,
+        },
+    )
+    @action(methods=['POST'], detail=False, url_path='bulk',
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create many recipes, reporting the outcome of each row."""
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError('Expected a list of recipes.')
+        max_rows = settings.BULK_IMPORT_MAX_ROWS
+        if len(rows) > max_rows:
+            raise ValidationError(f'At most {max_rows} recipes per request.')
+
+        serializer = self.get_serializer(data=rows, many=True)
+        results = []
+        valid = []
+        for index, row in enumerate(rows):
+            try:
+                attrs = serializer.child.run_validation(row)
+            except ValidationError as exc:
+                results.append(
+                    {'index': index, 'status': 'error', 'errors': exc.detail})
+            else:
+                valid.append((index, {**attrs, 'user': request.user}))
+
+        recipes = serializer.create([attrs for _, attrs in valid])
+        for (index, _), recipe in zip(valid, recipes):
+            results.append(
+                {'index': index, 'status': 'created', 'id': recipe.id})
+        results.sort(key=lambda result: result['index'])
+
+        failed = len(rows) - len(recipes)
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif recipes:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {'created': len(recipes), 'failed': failed, 'results': results},
+            status=response_status,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'since',
+                OpenApiTypes.STR,
+                description='Checkpoint returned by the previous call; '
+                            'omit it for a full sync.',
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(methods=['GET'], detail=False, url_path='changes')
+    def changes(self, request):
+        """Return recipes changed or deleted since a checkpoint.
+
+        Changes come in (updated_at, id) order, at most SYNC_MAX_CHANGES
+        at a time; with more set the client calls again with the new
+        checkpoint. Checkpoints trail the clock by at least
+        SYNC_CHECKPOINT_LAG, so writes still being committed are not
+        skipped and recent changes may be sent twice. A page ending
+        within the lag is the last one, as the rest are all recent.
+        """
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=settings.SYNC_CHECKPOINT_LAG)
+        recipes = self.get_queryset().order_by('updated_at', 'id')
+        deleted = []
+        token = request.query_params.get('since')
+        if token:
+            since, since_id = decode_checkpoint(token)
+            retention = timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+            if since < now - retention:
+                return Response(
+                    {'detail': 'Checkpoint expired, sync from scratch.'},
+                    status=status.HTTP_410_GONE,
+                )
+            recipes = recipes.filter(
+                Q(updated_at__gt=since)
+                | Q(updated_at=since, id__gt=since_id))
+            deleted = list(RecipeTombstone.objects.filter(
+                user=request.user, deleted_at__gt=since,
+            ).values_list('recipe_id', flat=True))
+
+        limit = settings.SYNC_MAX_CHANGES
+        changed = list(recipes[:limit + 1])
+        more = len(changed) > limit
+        changed = changed[:limit]
+        if more and changed[-1].updated_at <= cutoff:
+            checkpoint = encode_checkpoint(
+                changed[-1].updated_at, changed[-1].id)
+        else:
+            more = False
+            checkpoint = encode_checkpoint(cutoff)
+        return Response({
+            'changed': self.get_serializer(changed, many=True).data,
+            'deleted': deleted,
+            'checkpoint': checkpoint,
+            'more': more,
+        })
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'output',
+                OpenApiTypes.STR, enum=['json', 'ndjson'],
+                description='Stream a JSON array (default) or one JSON '
+                            'object per line.',
+            ),
+        ],
+        responses=serializers.RecipeDetailSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all of the user's recipes without buffering them."""
+        ndjson = request.query_params.get('output') == 'ndjson'
+        response = StreamingHttpResponse(
+            self._export_lines(self.get_queryset(), ndjson),
+            content_type=(
+                'application/x-ndjson' if ndjson else 'application/json'),
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.{}"'.format(
+                'ndjson' if ndjson else 'json'))
+        return response
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -99,40 +474,93 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.',
-            )
+            ),
+            OpenApiParameter(
+                'with_counts',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of recipes using each item.',
+            ),
         ]
     )
 )
-class BaseRecipeAtrrViewSet(mixins.ListModelMixin,
+class BaseRecipeAtrrViewSet(ReplicaReadMixin,
+                            ConditionalGetMixin,
+                            mixins.ListModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.DestroyModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for authenticated attributes."""
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+
+    def _flag(self, name):
+        """Return the boolean query parameter name, 400 if malformed."""
+        params = serializers.RecipeAttrFilterSerializer(
+            data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data[name]
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
-        assigned_only = bool(self.request.query_params.get('assigned_only'))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False).annotate(
-                num_recipes=Count('recipe')).filter(num_recipes__gt=0)
-        else:
-            queryset = queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self._flag('assigned_only'):
+            descriptor = getattr(Recipe, self.recipe_field)
+            target = descriptor.field.m2m_reverse_field_name()
+            links = descriptor.through.objects.filter(
+                **{target: OuterRef('pk')})
+            queryset = queryset.filter(Exists(links))
+        if self._flag('with_counts'):
+            queryset = queryset.annotate(recipe_count=Count('recipe'))
+
+        return queryset.order_by('-name', '-id')
+
+    def get_serializer_class(self):
+        """Return serializer class for request."""
+        if self.action == 'list' and self._flag('with_counts'):
+            return self.count_serializer_class
+
+        return self.serializer_class
+
+    def list(self, request, *args, **kwargs):
+        """List items, or answer 304 if the client is current."""
+        return self._conditional(self._cached_list, request, *args, **kwargs)
+
+    def _cached_list(self, request, *args, **kwargs):
+        """List items, served from the user's cache when possible."""
+        model = self.queryset.model
+        # A replica lagging behind a write caches its rows under the
+        # version it read, so readers of the primary, such as the writer,
+        # never get them.
+        key = f'{request.build_absolute_uri()}@{self.collection_version}'
+        data = attr_cache.get(model, request.user.id, key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            attr_cache.set(model, request.user.id, key, data)
+        return Response(data)
 
-        return queryset.order_by('-name').distinct()
+    def perform_update(self, serializer):
+        """Reject renaming onto a name the user already has."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': ['This name is already in use.']})
 
 
 class TagViewSet(BaseRecipeAtrrViewSet):
     """Manage tags in the database."""
 
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAtrrViewSet):
     """Manage ingredient in the database."""
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
     queryset = Ingredient.objects.all()
+    recipe_field = 'ingredients'
@@ -0,0 +1,141 @@
+"""
+Authentication for the APIs.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from core.asyncdb import database_sync_to_async
+from core.metrics import CACHE_REQUESTS
+
+
+class TokenLRU:
+    """Bounded, thread-safe LRU of token key -> Token with a TTL."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the live entry for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, token = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        """Store token under key, evicting the least recently used."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """Drop key if it is cached."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+token_lru = TokenLRU(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+def _shared_key(key):
+    """Return the shared cache key for a token key."""
+    return f'auth-token:{key}'
+
+
+def invalidate_token(key):
+    """Forget a cached token in this process and in the shared cache."""
+    token_lru.discard(key)
+    if settings.TOKEN_CACHE_SHARED:
+        cache.delete(_shared_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token and user lookup.
+
+    Tokens are kept in a per-process LRU for TOKEN_CACHE_TTL seconds and,
+    with TOKEN_CACHE_SHARED, in the shared cache as well. Deleting a
+    token or saving its user invalidates it (see user.signals); other
+    processes may keep using their local copy until it expires.
+    """
+
+    def authenticate_credentials(self, key):
+        return self._copies(self._cached(key) or self._load(key))
+
+    async def authenticate_async(self, request):
+        """Authenticate request without blocking the event loop.
+
+        Tokens in this process's LRU are resolved on the loop; the shared
+        cache and database are read from a pool thread. Returns None for
+        missing or malformed headers, leaving them to authenticate().
+        """
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            return None
+        token = self._cached(key)
+        if token is None:
+            token = await database_sync_to_async(self._load)(key)
+        return self._copies(token)
+
+    @staticmethod
+    def _cached(key):
+        """Return the token cached in this process for key, or None."""
+        token = token_lru.get(key)
+        if token is not None:
+            CACHE_REQUESTS.labels('token', 'hit').inc()
+        return token
+
+    def _load(self, key):
+        """Return the token for key from the shared cache or database."""
+        token = None
+        if settings.TOKEN_CACHE_SHARED:
+            token = cache.get(_shared_key(key))
+            if token is not None:
+                token_lru.set(key, token)
+        CACHE_REQUESTS.labels(
+            'token', 'miss' if token is None else 'hit').inc()
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_lru.set(key, token)
+            if settings.TOKEN_CACHE_SHARED:
+                cache.set(
+                    _shared_key(key), token, settings.TOKEN_CACHE_TTL)
+        return token
+
+    @staticmethod
+    def _copies(token):
+        """Return (user, token) copies of a cached token.
+
+        Each request gets its own copies so changes made while handling
+        it never leak into the cached instances.
+        """
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return (token.user, token)
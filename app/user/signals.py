@@ -0,0 +1,24 @@
+"""
+Signal handlers keeping the token cache in step with writes.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_save, post_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token as soon as it is deleted."""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached copies of a user, e.g. after deactivation."""
+    if not created:
+        for key in Token.objects.filter(
+                user=instance).values_list('key', flat=True):
+            invalidate_token(key)
@@ -0,0 +1,140 @@
+"""
+Tests for the cached token authentication.
+"""
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import (
+    CachedTokenAuthentication,
+    TokenLRU,
+    token_lru,
+)
+
+ME_URL = reverse('user:me')
+
+
+class TokenLRUTests(TestCase):
+    """Test the in-process token LRU."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is evicted when full."""
+        lru = TokenLRU(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped once their TTL has passed."""
+        patched_monotonic.return_value = 100
+        lru = TokenLRU(maxsize=2, ttl=30)
+        lru.set('a', 1)
+
+        patched_monotonic.return_value = 129
+        self.assertEqual(lru.get('a'), 1)
+        patched_monotonic.return_value = 131
+        self.assertIsNone(lru.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests with a cached token."""
+
+    def setUp(self):
+        token_lru.clear()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='token@example.com',
+            password='testpass123',
+            name='Token User',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_cached_after_first_request(self):
+        """Test repeat requests do not query the token table."""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is still rejected."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test deleting a token invalidates its cache entry."""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user invalidates their cached token."""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_not_served_stale(self):
+        """Test the cached user is refreshed after an update."""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'New Name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    @override_settings(TOKEN_CACHE_SHARED=True)
+    def test_shared_cache_used_across_processes(self):
+        """Test a token cached by another process avoids the database."""
+        self.client.get(ME_URL)
+        token_lru.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_authenticate_async(self):
+        """Test async authentication reads cached tokens on the loop."""
+        auth = CachedTokenAuthentication()
+        request = RequestFactory().get(
+            ME_URL, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        auth.authenticate_credentials(self.token.key)
+
+        with patch.object(auth, '_load') as load:
+            user, token = async_to_sync(auth.authenticate_async)(request)
+
+        load.assert_not_called()
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+        self.assertIsNone(async_to_sync(auth.authenticate_async)(
+            RequestFactory().get(ME_URL, HTTP_AUTHORIZATION='Token')))
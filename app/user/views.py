@@ -2,10 +2,11 @@
 Views for the user API.
 """
 
-from rest_framework import (generics, authentication, permissions)
+from rest_framework import (generics, permissions)
 from rest_framework.authtoken.views import ObtainAuthToken
 from user.serializer import (UserSerializer, AuthTokenSerializer)
 from rest_framework.settings import api_settings
+from user.authentication import CachedTokenAuthentication
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -23,7 +24,7 @@ class AuthTokenView(ObtainAuthToken):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -1,13 +1,72 @@
+upstream app {
+  server     ${APP_HOST}:${APP_PORT};
+  keepalive  ${PROXY_UPSTREAM_KEEPALIVE};
+}
+
+# Micro-cache for anonymous schema and docs responses (PROXY_MICROCACHE)
+${APP_PROTOCOL}_cache_path  /tmp/nginx-microcache levels=1:2
+                            keys_zone=microcache:10m max_size=100m
+                            inactive=10m use_temp_path=off;
+
 server {
   listen ${LISTEN_PORT};
 
-  location /static {
-    alias /vol/static;
+  sendfile     ${PROXY_SENDFILE};
+  tcp_nopush   on;
+  tcp_nodelay  on;
+
+  gzip             ${PROXY_GZIP};
+  gzip_comp_level  ${PROXY_GZIP_LEVEL};
+  gzip_min_length  1024;
+  gzip_proxied     any;
+  gzip_vary        on;
+  gzip_types       application/json application/x-ndjson
+                   application/vnd.oai.openapi application/javascript
+                   text/css text/plain image/svg+xml;
+
+  open_file_cache           ${PROXY_OPEN_FILE_CACHE};
+  open_file_cache_valid     60s;
+  open_file_cache_min_uses  2;
+  open_file_cache_errors    on;
+
+  client_max_body_size     10M;
+  client_body_buffer_size  ${PROXY_CLIENT_BODY_BUFFER_SIZE};
+
+  ${APP_PROTOCOL}_buffering    ${PROXY_BUFFERING};
+  ${APP_PROTOCOL}_buffer_size  ${PROXY_BUFFER_SIZE};
+  ${APP_PROTOCOL}_buffers      ${PROXY_BUFFERS};
+
+  location /static/static {
+    root     /vol;
+    expires  ${PROXY_STATIC_EXPIRES};
+
+    # Names hashed by collectstatic change with their contents
+    location ~ "\.[0-9a-f]{12}\.\w+$" {
+      expires     off;
+      add_header  Cache-Control "public, max-age=31536000, immutable";
+    }
+  }
+
+  location /static/media {
+    root     /vol;
+    expires  ${PROXY_MEDIA_EXPIRES};
+  }
+
+  location ~ ^/api/(schema|docs)/ {
+    include  /etc/nginx/${APP_PROTOCOL}_pass.conf;
+
+    ${APP_PROTOCOL}_cache            ${PROXY_MICROCACHE_ZONE};
+    ${APP_PROTOCOL}_cache_key        $scheme$host$request_uri$http_accept;
+    ${APP_PROTOCOL}_cache_valid      200 ${PROXY_MICROCACHE_TTL};
+    ${APP_PROTOCOL}_cache_lock       on;
+    ${APP_PROTOCOL}_cache_use_stale  updating error timeout;
+    # Only anonymous requests are cached
+    ${APP_PROTOCOL}_cache_bypass     $http_authorization $cookie_sessionid;
+    ${APP_PROTOCOL}_no_cache         $http_authorization $cookie_sessionid;
+    add_header  X-Cache-Status $upstream_cache_status;
   }
 
   location / {
-    uwsgi_pass            ${APP_HOST}:${APP_PORT};
-    include               /etc/nginx/uwsgi_params;
-    client_max_body_size  10M;
+    include  /etc/nginx/${APP_PROTOCOL}_pass.conf;
   }
-}
\ No newline at end of file
+}
@@ -1,3 +1,50 @@
 #!/bin/sh
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+# uvicorn speaks HTTP, uwsgi its own protocol (see scripts/run.sh)
+if [ "${APP_SERVER:-uwsgi}" = "uvicorn" ]; then
+    export APP_PROTOCOL=http
+else
+    export APP_PROTOCOL=uwsgi
+fi
+
+# Each part of the template is set below; "off" disables the on/off ones
+# gzip JSON and text responses at PROXY_GZIP_LEVEL (1-9)
+export PROXY_GZIP="${PROXY_GZIP:-on}"
+export PROXY_GZIP_LEVEL="${PROXY_GZIP_LEVEL:-5}"
+# Serve files with sendfile, sending headers and file start together
+export PROXY_SENDFILE="${PROXY_SENDFILE:-on}"
+# Cache descriptors of up to this many static and media files
+if [ "${PROXY_OPEN_FILE_CACHE:-1000}" = "off" ]; then
+    export PROXY_OPEN_FILE_CACHE=off
+else
+    export PROXY_OPEN_FILE_CACHE="max=${PROXY_OPEN_FILE_CACHE:-1000} inactive=60s"
+fi
+# Browser caching of unhashed static files and of media; hashed static
+# files (ManifestStaticFilesStorage names) are always cached as immutable
+export PROXY_STATIC_EXPIRES="${PROXY_STATIC_EXPIRES:-1h}"
+export PROXY_MEDIA_EXPIRES="${PROXY_MEDIA_EXPIRES:-1h}"
+# Idle connections kept open to uvicorn (uwsgi closes them anyway)
+export PROXY_UPSTREAM_KEEPALIVE="${PROXY_UPSTREAM_KEEPALIVE:-32}"
+# Buffer app responses so workers are freed before slow clients read
+# them; requests are always read in full before they are passed on
+export PROXY_BUFFERING="${PROXY_BUFFERING:-on}"
+export PROXY_BUFFER_SIZE="${PROXY_BUFFER_SIZE:-16k}"
+export PROXY_BUFFERS="${PROXY_BUFFERS:-16 16k}"
+export PROXY_CLIENT_BODY_BUFFER_SIZE="${PROXY_CLIENT_BODY_BUFFER_SIZE:-128k}"
+# Seconds anonymous schema and docs responses are cached, 0 to disable
+PROXY_MICROCACHE="${PROXY_MICROCACHE:-0}"
+if [ "$PROXY_MICROCACHE" = "0" ] || [ "$PROXY_MICROCACHE" = "off" ]; then
+    export PROXY_MICROCACHE_ZONE=off PROXY_MICROCACHE_TTL=1s
+else
+    export PROXY_MICROCACHE_ZONE=microcache
+    export PROXY_MICROCACHE_TTL="${PROXY_MICROCACHE%s}s"
+fi
+
+# Only substitute these, leaving nginx's own $variables alone
+VARIABLES='${LISTEN_PORT} ${APP_HOST} ${APP_PORT} ${APP_PROTOCOL}
+    ${PROXY_GZIP} ${PROXY_GZIP_LEVEL} ${PROXY_SENDFILE}
+    ${PROXY_OPEN_FILE_CACHE} ${PROXY_STATIC_EXPIRES} ${PROXY_MEDIA_EXPIRES}
+    ${PROXY_UPSTREAM_KEEPALIVE} ${PROXY_BUFFERING} ${PROXY_BUFFER_SIZE}
+    ${PROXY_BUFFERS} ${PROXY_CLIENT_BODY_BUFFER_SIZE}
+    ${PROXY_MICROCACHE_ZONE} ${PROXY_MICROCACHE_TTL}'
+envsubst "$VARIABLES" < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
 nginx -g 'daemon off;'
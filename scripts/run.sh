@@ -14,6 +14,37 @@ python manage.py collectstatic --noinput
 echo "Applying database migrations..."
 python manage.py migrate
 
-# Start the uwsgi server
+# Workers share metrics through files in this directory; start clean so
+# samples of processes from a previous run are not aggregated
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# APP_SERVER picks uwsgi (WSGI, the default) or uvicorn (ASGI with the
+# async read views, see app/asgi.py). Both listen on port 9000; the proxy
+# must be started with the same APP_SERVER to pick the protocol.
+APP_SERVER="${APP_SERVER:-uwsgi}"
+
+if [ "$APP_SERVER" = "uvicorn" ]; then
+    # Run the image worker and a daily tombstone prune alongside,
+    # restarting the worker whenever it exits as uwsgi's attach-daemon does
+    (while true; do
+        python manage.py process_images
+        echo "process_images exited with status $?, restarting..." >&2
+        sleep 1
+    done) &
+    (while sleep 86400; do python manage.py prune_tombstones; done) &
+
+    echo "Starting uvicorn server..."
+    exec uvicorn app.asgi:application --host 0.0.0.0 --port 9000 \
+        --workers "${APP_WORKERS:-$(nproc)}" --no-access-log \
+        --proxy-headers --forwarded-allow-ips "*"
+fi
+
+# Size uwsgi for the container's CPUs and memory; WSGI_* variables
+# override each setting. Its master also keeps the image worker running
+# and prunes expired recipe tombstones nightly
+python manage.py uwsgi_ini --output /tmp/uwsgi.ini
+
 echo "Starting uwsgi server..."
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+exec uwsgi --ini /tmp/uwsgi.ini